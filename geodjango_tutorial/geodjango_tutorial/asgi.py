@@ -14,4 +14,22 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "geodjango_tutorial.settings")
 django.setup()
 
-application = get_asgi_application()
+# Build the HTTP app before importing anything that touches models
+django_asgi_app = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter
+from channels.auth import AuthMiddlewareStack
+from channels.security.websocket import AllowedHostsOriginValidator
+from world.middleware import TokenAuthMiddleware
+from world.routing import websocket_urlpatterns
+
+# TokenAuthMiddleware runs inside the session stack so that a token user
+# replaces the session user rather than being wrapped by it
+application = ProtocolTypeRouter({
+    "http": django_asgi_app,
+    "websocket": AllowedHostsOriginValidator(
+        AuthMiddlewareStack(
+            TokenAuthMiddleware(URLRouter(websocket_urlpatterns))
+        )
+    ),
+})
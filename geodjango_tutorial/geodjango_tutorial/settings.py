@@ -59,6 +59,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'world.middleware.InstrumentationMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.security.SecurityMiddleware',
@@ -67,7 +68,6 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'world.middleware.DebugMiddleware',
 ]
 
 ROOT_URLCONF = "geodjango_tutorial.urls"
@@ -89,6 +89,17 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "geodjango_tutorial.wsgi.application"
+ASGI_APPLICATION = "geodjango_tutorial.asgi.application"
+
+# Channels (WebSocket) layer used by world.consumers and world.events
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels_redis.core.RedisChannelLayer',
+        'CONFIG': {
+            "hosts": [(os.getenv('REDIS_HOST', 'localhost'), 6379)],
+        },
+    }
+}
 
 
 # Database
@@ -117,6 +128,125 @@ if os.name == 'nt':
     GDAL_LIBRARY_PATH = os.path.join(VIRTUAL_ENV_BASE, r'Library\bin\gdal.dll')
     GEOS_LIBRARY_PATH = os.path.join(VIRTUAL_ENV_BASE, r'Library\bin\geos_c.dll')
 
+# Location ingest: seconds between batched writes of buffered GPS fixes
+LOCATION_FLUSH_INTERVAL = float(os.getenv('LOCATION_FLUSH_INTERVAL', '2.0'))
+
+# Location jitter filter (world.ingest.FixFilter). Fixes within LOCATION_MIN_MOVE
+# metres (or the reported accuracy, if larger) of the last accepted fix, fixes
+# less accurate than LOCATION_MAX_ACCURACY metres and jumps faster than
+# LOCATION_MAX_SPEED m/s are dropped. Filter state is kept for
+# LOCATION_FILTER_TTL seconds after a player's last accepted fix.
+LOCATION_MIN_MOVE = 5
+LOCATION_MAX_ACCURACY = 100
+LOCATION_MAX_SPEED = 50
+LOCATION_FILTER_TTL = 600
+
+# Capture detection: hunters within this many metres of the hunted player win.
+# PROXIMITY_ENGINE is 'numpy' (vectorised in process) or 'postgis' (ST_DWithin).
+CAPTURE_RADIUS_METERS = 10
+PROXIMITY_ENGINE = os.getenv('PROXIMITY_ENGINE', 'numpy')
+
+# Game ticker (python manage.py run_game_ticker), all values in seconds
+GAME_TICK_CAPTURE_INTERVAL = 2
+GAME_TICK_REFRESH_INTERVAL = 5
+GAME_TICK_ZONE_INTERVAL = 5
+
+# Zone shrink schedule (world.shrink): every AREA_REDUCTION_INTERVAL seconds the
+# zone shrinks to AREA_SHRINK_FACTOR of its radius, down to AREA_MIN_RADIUS
+# metres, animating over the last AREA_SHRINK_TRANSITION seconds
+AREA_REDUCTION_INTERVAL = 25 * 60
+AREA_SHRINK_FACTOR = 0.8
+AREA_MIN_RADIUS = 50
+AREA_SHRINK_TRANSITION = 60
+
+# Chat paging and long-polling (GET .../messages/?after_id=&wait=). Waiters
+# wait on the game's chat channel group and are woken when a message is sent
+# (see world.events).
+CHAT_PAGE_SIZE = 50
+CHAT_MAX_PAGE_SIZE = 200
+CHAT_LONG_POLL_TIMEOUT = 25
+
+# Location notes map: below NOTE_CLUSTER_MAX_ZOOM notes are returned as grid
+# clusters roughly NOTE_CLUSTER_CELL_PX wide, otherwise as individual notes
+NOTE_CLUSTER_MAX_ZOOM = 13
+NOTE_CLUSTER_CELL_PX = 64
+NOTES_MAX_RESULTS = 500
+
+# Vector tiles (/api/tiles/<layer>/<z>/<x>/<y>.mvt). Tiles up to
+# TILE_CACHE_MAX_ZOOM are cached on disk, except the games layer which changes
+# outside the web container; TILE_MAX_AGE is the browser cache lifetime per
+# layer, in seconds.
+TILE_CACHE_DIR = os.getenv('TILE_CACHE_DIR', os.path.join(BASE_DIR, 'tile_cache'))
+TILE_CACHE_MAX_ZOOM = 16
+TILE_MAX_AGE = {
+    'world_borders': 86400,
+    'games': 0,
+    'notes': 60,
+}
+
+# Game area output. GAME_AREA_FORMAT is 'polygon' (GeoJSON ring) or 'circle'
+# ({center, radius}); clients can override it per request with ?area=.
+# GEOJSON_PRECISION is decimal places of longitude/latitude (6 is ~0.1 m) and
+# GEOJSON_SIMPLIFY_TOLERANCE a simplification tolerance in degrees (0 is off).
+GAME_AREA_FORMAT = 'polygon'
+# Vertices used to approximate a circular game area
+GAME_AREA_SEGMENTS = 64
+GEOJSON_PRECISION = 6
+GEOJSON_SIMPLIFY_TOLERANCE = 0
+
+# Shared cache (Redis). Holds the per-game state used by the views' hot-path
+# permission checks, see world.cache.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': f"redis://{os.getenv('REDIS_HOST', 'localhost')}:6379/1",
+    }
+}
+GAME_STATE_CACHE_TTL = 300
+
+# Token authentication cache (world.authentication). Token -> user lookups are
+# kept TOKEN_CACHE_TTL seconds in the shared cache and TOKEN_CACHE_LOCAL_TTL
+# seconds in a per-process LRU of TOKEN_CACHE_SIZE entries.
+TOKEN_CACHE_TTL = 300
+TOKEN_CACHE_LOCAL_TTL = 30
+TOKEN_CACHE_SIZE = 10000
+
+# Request instrumentation (world.middleware.InstrumentationMiddleware), off by
+# default. A fraction INSTRUMENTATION_SAMPLE_RATE of requests is recorded into
+# an in-process ring buffer of INSTRUMENTATION_BUFFER_SIZE samples, summarised
+# for admins at /api/metrics/.
+INSTRUMENTATION_ENABLED = os.getenv('INSTRUMENTATION_ENABLED', 'False') == 'True'
+INSTRUMENTATION_SAMPLE_RATE = float(os.getenv('INSTRUMENTATION_SAMPLE_RATE', '1.0'))
+INSTRUMENTATION_BUFFER_SIZE = 10000
+
+# Logging. Records go through a queue to a background writer thread
+# (world.log), so logging never blocks a request on stdout. Levels are per
+# module; world.views and world.models log at DEBUG for request detail.
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'background': {
+            '()': 'world.log.background_handler',
+        },
+    },
+    'root': {
+        'handlers': ['background'],
+        'level': 'WARNING',
+    },
+    'loggers': {
+        'django': {'level': 'INFO'},
+        'world': {'level': LOG_LEVEL},
+        'world.views': {'level': os.getenv('WORLD_VIEWS_LOG_LEVEL', LOG_LEVEL)},
+        'world.models': {'level': os.getenv('WORLD_MODELS_LOG_LEVEL', LOG_LEVEL)},
+    },
+}
+
+# Track compaction (python manage.py compact_tracks): fixes within this many
+# metres of a finished game's simplified track (at the same moment) are dropped
+TRACK_SIMPLIFY_TOLERANCE = 5
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
@@ -235,7 +365,7 @@ CORS_ALLOW_CREDENTIALS = True
 # Django REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'world.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -243,6 +373,18 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Fast read paths (see python manage.py benchmark_serializers).
+# FAST_SERIALIZERS builds game detail, game list and chat responses from
+# .values() rows (world.fast_serializers) instead of DRF serializers, and
+# FAST_JSON_RENDERER renders API responses with orjson (world.renderers).
+FAST_SERIALIZERS = os.getenv('FAST_SERIALIZERS', 'False') == 'True'
+FAST_JSON_RENDERER = os.getenv('FAST_JSON_RENDERER', 'False') == 'True'
+if FAST_JSON_RENDERER:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = [
+        'world.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ]
+
 # Disable HTTPS requirements in development
 SECURE_SSL_REDIRECT = False
 SESSION_COOKIE_SECURE = False
@@ -47,4 +47,8 @@ CORS_ALLOW_HEADERS = ['*']
 
 AUTHENTICATION_BACKENDS = [
     'django.contrib.auth.backends.ModelBackend',
-] 
\ No newline at end of file
+] 
+
+# Request level detail from the views and models while developing
+LOGGING['loggers']['world.views']['level'] = 'DEBUG'
+LOGGING['loggers']['world.models']['level'] = 'DEBUG'
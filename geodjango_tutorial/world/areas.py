@@ -0,0 +1,77 @@
+"""
+Game areas.
+
+Areas are circles given by a centre and a radius in metres. The polygon stored
+on the Game is built geodesically (each vertex is the point radius_m away from
+the centre along its bearing) so it stays a true circle at any latitude, and
+generated rings are cached per (centre, radius, segments). Point-in-area tests
+for circular areas are a single haversine distance against the radius rather
+than a polygon containment test, cheap enough for every position update (see
+GameConsumer). The periodic zone enforcement across all games runs in the
+database, see world.zone.
+"""
+
+import math
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.gis.geos import Point, Polygon
+
+from .geo import destination, geometry_to_geojson, haversine_m
+
+POLYGON = 'polygon'
+CIRCLE = 'circle'
+
+
+def area_representation(game, area_format=None, precision=None):
+    """Serialise a game's current area.
+
+    ``polygon`` sends the area ring as precision limited GeoJSON. ``circle``
+    sends only the centre and radius in metres, which is all a client needs to
+    draw a circular zone, and falls back to the polygon when the game has no
+    centre.
+    """
+    area_format = area_format or settings.GAME_AREA_FORMAT
+    if precision is None:
+        precision = settings.GEOJSON_PRECISION
+
+    if area_format == CIRCLE and game.center and game.radius:
+        return {
+            'type': 'Circle',
+            'center': [round(game.center.x, precision), round(game.center.y, precision)],
+            'radius': game.radius,
+        }
+    return geometry_to_geojson(
+        game.current_area, precision, settings.GEOJSON_SIMPLIFY_TOLERANCE
+    )
+
+
+@lru_cache(maxsize=1024)
+def _circle_ring(lng, lat, radius_m, segments):
+    ring = [
+        destination(lng, lat, 2 * math.pi * i / segments, radius_m)
+        for i in range(segments)
+    ]
+    ring.append(ring[0])
+    return tuple(ring)
+
+
+def circle_polygon(center, radius_m, segments=None):
+    """Polygon approximating the geodesic circle of radius_m around a Point"""
+    segments = segments or settings.GAME_AREA_SEGMENTS
+    # Round the key so float noise in the centre does not defeat the cache
+    ring = _circle_ring(round(center.x, 7), round(center.y, 7), float(radius_m), segments)
+    return Polygon(ring, srid=4326)
+
+
+def point_in_circle(lng, lat, center, radius_m):
+    return haversine_m(lng, lat, center.x, center.y) <= radius_m
+
+
+def point_in_area(game, lng, lat):
+    """Whether lng/lat is inside the game's current area"""
+    if game.center and game.radius:
+        return point_in_circle(lng, lat, game.center, game.radius)
+    if game.current_area:
+        return game.current_area.contains(Point(lng, lat, srid=4326))
+    return True
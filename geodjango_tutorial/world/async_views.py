@@ -0,0 +1,153 @@
+"""
+ASGI-native versions of the hot read endpoints.
+
+Game detail, chat fetches and current_user are polled constantly by every
+client. These views run on the event loop with the async ORM, so idle
+long-polls and slow clients don't hold a worker thread. Anything but a read
+is handed to the synchronous DRF view unchanged.
+
+The views are marked csrf_exempt with an attribute rather than the decorator,
+which in Django 4.2 wraps the view in a sync function and breaks coroutines.
+"""
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from rest_framework.exceptions import ValidationError
+from rest_framework.utils.encoders import JSONEncoder
+
+from . import views, fast_serializers
+from .authentication import aauthenticate
+from .cache import aget_game_state
+from .events import wait_for_chat_message
+from .models import Game
+from .serializers import GameSerializer, ChatMessageSerializer
+
+game_detail_sync = views.GameDetail.as_view()
+
+
+def json_response(data, status=200):
+    if settings.FAST_JSON_RENDERER:
+        from .renderers import dumps
+        return HttpResponse(dumps(data), status=status, content_type='application/json')
+    return JsonResponse(data, status=status, safe=False, encoder=JSONEncoder)
+
+
+def method_not_allowed(request, allowed):
+    response = json_response({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+    response['Allow'] = ', '.join(allowed)
+    return response
+
+
+def not_authenticated():
+    response = json_response({'detail': 'Authentication credentials were not provided.'}, status=401)
+    response['WWW-Authenticate'] = 'Token'
+    return response
+
+
+async def get_message_page(game_id, params, fields=None):
+    """Return one page of a game's chat, oldest first.
+
+    ``after_id`` returns messages newer than that id, ``before_id`` returns the
+    page before it, and with neither the latest page is returned. ``limit`` is
+    capped at CHAT_MAX_PAGE_SIZE. With ``after_id`` and ``wait`` (seconds) the
+    request is held on the event loop until a new message is published or the
+    wait expires, and only queries when one is.
+    """
+    after_id, before_id, limit, wait = views.parse_message_page(params)
+    page = views.message_page_query(game_id, after_id, before_id, limit, fields)
+
+    if after_id is not None:
+        async def check():
+            return [message async for message in page.all()]
+
+        if not wait:
+            return await check()
+        # Sleeps on the channel layer until a newer message is published
+        return await wait_for_chat_message(game_id, after_id, wait, check)
+
+    return [message async for message in page][::-1]
+
+
+async def game_detail(request, pk):
+    if request.method != 'GET':
+        return await sync_to_async(game_detail_sync)(request, pk=pk)
+
+    user = await aauthenticate(request)
+    if not user.is_authenticated:
+        return not_authenticated()
+
+    area_format = request.GET.get('area')
+    if settings.FAST_SERIALIZERS:
+        data = await fast_serializers.agame_detail(Game.objects.filter(pk=pk), area_format)
+        if data is None:
+            return json_response({'detail': 'Not found.'}, status=404)
+        return json_response(data)
+
+    game = await GameSerializer.setup_eager_loading(Game.objects.filter(pk=pk)).afirst()
+    if game is None:
+        return json_response({'detail': 'Not found.'}, status=404)
+    data = GameSerializer(game, context={'area_format': area_format}).data
+    return json_response(data)
+
+
+game_detail.csrf_exempt = True
+
+
+async def chat_history(request, game_id):
+    if request.method != 'GET':
+        return method_not_allowed(request, ['GET'])
+
+    user = await aauthenticate(request)
+    if not user.is_authenticated:
+        return not_authenticated()
+    if await aget_game_state(game_id) is None:
+        return json_response({'error': 'Game not found'}, status=404)
+
+    return await chat_page_response(game_id, request.GET)
+
+
+chat_history.csrf_exempt = True
+
+
+async def game_messages(request, game_id):
+    if request.method != 'GET':
+        return await sync_to_async(views.game_messages)(request, game_id)
+
+    user = await aauthenticate(request)
+    if not user.is_authenticated:
+        return not_authenticated()
+    state = await aget_game_state(game_id)
+    if state is None:
+        return json_response({'error': 'Game not found'}, status=404)
+    if user.id not in state['members']:
+        return json_response({'error': 'Not authorized to access this game'}, status=403)
+
+    return await chat_page_response(game_id, request.GET)
+
+
+game_messages.csrf_exempt = True
+
+
+async def chat_page_response(game_id, params):
+    try:
+        if settings.FAST_SERIALIZERS:
+            rows = await get_message_page(game_id, params, fast_serializers.CHAT_FIELDS)
+            return json_response([fast_serializers.chat_message(row) for row in rows])
+        messages = await get_message_page(game_id, params)
+    except ValidationError as e:
+        return json_response(e.detail, status=400)
+    return json_response(ChatMessageSerializer(messages, many=True).data)
+
+
+async def current_user(request):
+    if request.method != 'GET':
+        return await sync_to_async(views.current_user)(request)
+
+    user = await aauthenticate(request)
+    if user.is_authenticated:
+        return json_response({'id': user.id, 'username': user.username})
+    return json_response({'error': 'Not authenticated'}, status=401)
+
+
+current_user.csrf_exempt = True
@@ -0,0 +1,161 @@
+"""
+Token authentication with a cache in front of the Token table.
+
+Every API call authenticates with a DRF token, which costs a Token and User
+join before the view runs. Token to user lookups are kept in a small in-process
+LRU for TOKEN_CACHE_LOCAL_TTL seconds and in the shared cache (Redis) for
+TOKEN_CACHE_TTL seconds, so the database is only asked on a miss in both.
+Receivers in world.models call ``invalidate_token`` when a token is deleted or
+its user deactivated; other processes drop their local copy within
+TOKEN_CACHE_LOCAL_TTL.
+
+The async views can't use DRF authentication classes, they resolve the user
+with ``aauthenticate`` which goes through the same caches. The session user
+is loaded with ``django.contrib.auth.get_user`` (``request.auser()`` needs
+Django 5.0, the image runs 4.2).
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+TOKEN_KEYWORD = 'Token'
+
+
+class LocalTokenCache:
+    """Bounded LRU of token key -> user, each entry expiring after a TTL"""
+
+    def __init__(self, size=None, ttl=None):
+        self.size = size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user
+
+    def set(self, key, user):
+        size = self.size or getattr(settings, 'TOKEN_CACHE_SIZE', 10000)
+        ttl = self.ttl if self.ttl is not None else getattr(settings, 'TOKEN_CACHE_LOCAL_TTL', 30)
+        with self._lock:
+            self._entries[key] = (user, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_tokens = LocalTokenCache()
+
+
+def token_cache_key(token_key):
+    # Don't put raw tokens in Redis
+    return 'auth_token:' + hashlib.sha256(token_key.encode()).hexdigest()
+
+
+def load_token_user(token_key):
+    try:
+        return Token.objects.select_related('user').get(key=token_key).user
+    except Token.DoesNotExist:
+        return None
+
+
+def get_token_user(token_key):
+    """User for a token key, or None if there is no such token"""
+    user = local_tokens.get(token_key)
+    if user is not None:
+        return user
+
+    shared_key = token_cache_key(token_key)
+    user = cache.get(shared_key)
+    if user is None:
+        user = load_token_user(token_key)
+        if user is None:
+            return None
+        cache.set(shared_key, user, settings.TOKEN_CACHE_TTL)
+    local_tokens.set(token_key, user)
+    return user
+
+
+async def aget_token_user(token_key):
+    """get_token_user for async code"""
+    user = local_tokens.get(token_key)
+    if user is not None:
+        return user
+
+    shared_key = token_cache_key(token_key)
+    user = await cache.aget(shared_key)
+    if user is None:
+        user = await sync_to_async(load_token_user)(token_key)
+        if user is None:
+            return None
+        await cache.aset(shared_key, user, settings.TOKEN_CACHE_TTL)
+    local_tokens.set(token_key, user)
+    return user
+
+
+def invalidate_token(*token_keys):
+    """Forget cached lookups of deleted tokens"""
+    for token_key in token_keys:
+        local_tokens.delete(token_key)
+    cache.delete_many([token_cache_key(token_key) for token_key in token_keys])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication that resolves tokens through the token caches"""
+
+    keyword = TOKEN_KEYWORD
+
+    def authenticate_credentials(self, key):
+        user = get_token_user(key)
+        if user is None:
+            raise AuthenticationFailed('Invalid token.')
+        if not user.is_active:
+            raise AuthenticationFailed('User inactive or deleted.')
+        return (user, Token(key=key, user=user))
+
+
+def get_token_key(request):
+    """Token key from the Authorization header, or None"""
+    header = request.headers.get('Authorization', '').split()
+    if len(header) != 2 or header[0] != TOKEN_KEYWORD:
+        return None
+    return header[1]
+
+
+async def aauthenticate(request):
+    """The request's user, AnonymousUser if it isn't authenticated"""
+    token_key = get_token_key(request)
+    if token_key is None:
+        return await sync_to_async(get_user)(request)
+
+    user = await aget_token_user(token_key)
+    if user is None or not user.is_active:
+        return AnonymousUser()
+    return user
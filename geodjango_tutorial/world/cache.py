@@ -0,0 +1,113 @@
+"""
+Per-game state cache.
+
+Most API calls only need to know a game's status, who hosts it and who plays in
+it (and on which team) before doing anything else. That state is cached as a
+small dict per game, stored under the game's current generation. Whenever a
+Game or GamePlayer row is saved or deleted the generation is bumped once the
+transaction commits (see the receivers at the bottom of world.models), so every
+reader moves to a new key. A reader that loaded the state before the commit can
+only write it under the old generation, which nobody reads any more.
+"""
+
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+def game_generation_key(game_id):
+    return f'game_state_generation:{game_id}'
+
+
+def game_state_key(game_id, generation):
+    return f'game_state:{game_id}:{generation}'
+
+
+def initial_generation():
+    # A lost generation key restarts from the clock rather than from 0, so it
+    # can't come back to a generation that still has a cached state
+    return time.time_ns()
+
+
+def load_game_state(game_id):
+    from .models import Game, GamePlayer
+
+    game = (
+        Game.objects
+        .filter(id=game_id)
+        .values('id', 'status', 'host_id', 'area_set', 'total_kitty')
+        .first()
+    )
+    if game is None:
+        return None
+
+    game['total_kitty'] = str(game['total_kitty'])
+    # user id -> team
+    game['members'] = dict(
+        GamePlayer.objects.filter(game_id=game_id).values_list('user_id', 'team')
+    )
+    return game
+
+
+def get_generation(game_id):
+    key = game_generation_key(game_id)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, initial_generation(), None)
+        generation = cache.get(key)
+    return generation
+
+
+async def aget_generation(game_id):
+    key = game_generation_key(game_id)
+    generation = await cache.aget(key)
+    if generation is None:
+        await cache.aadd(key, initial_generation(), None)
+        generation = await cache.aget(key)
+    return generation
+
+
+def get_game_state(game_id):
+    """Cached state dict for a game, or None if the game does not exist"""
+    key = game_state_key(game_id, get_generation(game_id))
+    state = cache.get(key)
+    if state is None:
+        state = load_game_state(game_id)
+        if state is not None:
+            cache.set(key, state, settings.GAME_STATE_CACHE_TTL)
+    return state
+
+
+async def aget_game_state(game_id):
+    """get_game_state for async views"""
+    key = game_state_key(game_id, await aget_generation(game_id))
+    state = await cache.aget(key)
+    if state is None:
+        state = await sync_to_async(load_game_state)(game_id)
+        if state is not None:
+            await cache.aset(key, state, settings.GAME_STATE_CACHE_TTL)
+    return state
+
+
+def bump_generation(game_id):
+    key = game_generation_key(game_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # No generation yet, or it was evicted
+        cache.add(key, initial_generation(), None)
+
+
+def invalidate_game_state(*game_ids):
+    """Make readers reload the state of game_ids once the transaction commits.
+
+    Outside a transaction the generations are bumped immediately.
+    """
+    def bump():
+        for game_id in game_ids:
+            bump_generation(game_id)
+
+    transaction.on_commit(bump)
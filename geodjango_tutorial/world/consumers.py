@@ -0,0 +1,139 @@
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from .areas import point_in_area
+from .events import game_group_name
+from .ingest import location_buffer
+from .models import Game, GamePlayer, ChatMessage
+
+
+class GameConsumer(AsyncJsonWebsocketConsumer):
+    """Live channel for a single game.
+
+    Players stream their position over the socket and receive everyone else's
+    positions, chat messages and the server side events (area, kitty and game
+    finished updates) that are pushed through ``world.events.send_game_event``.
+    """
+
+    async def connect(self):
+        self.game_id = self.scope['url_route']['kwargs']['game_id']
+        self.group_name = game_group_name(self.game_id)
+        self.player = None
+        # Whether the last accepted fix was inside the zone, None before the first
+        self.inside_zone = None
+
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+
+        self.player = await self.get_player(user)
+        if self.player is None:
+            await self.close(code=4403)
+            return
+        self.game = self.player.game
+
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if self.player is not None:
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        message_type = content.get('type')
+
+        if message_type == 'location':
+            await self.handle_location(content)
+        elif message_type == 'chat_message':
+            await self.handle_chat_message(content)
+        elif message_type == 'ping':
+            await self.send_json({'type': 'pong'})
+        else:
+            await self.send_json({'type': 'error', 'error': 'Unknown message type'})
+
+    async def handle_location(self, content):
+        try:
+            latitude = float(content['latitude'])
+            longitude = float(content['longitude'])
+            accuracy = content.get('accuracy')
+            accuracy = float(accuracy) if accuracy is not None else None
+        except (KeyError, TypeError, ValueError):
+            await self.send_json({'type': 'error', 'error': 'Invalid coordinates provided'})
+            return
+
+        accepted = location_buffer.add_player_fix(
+            self.player.id, latitude, longitude, accuracy, game_id=self.game_id
+        )
+        if not accepted:
+            # Jitter or an impossible jump, nothing worth telling the others
+            return
+
+        # Tell the player straight away when they cross the zone boundary,
+        # rather than at the next zone check
+        inside = point_in_area(self.game, longitude, latitude)
+        if inside != self.inside_zone:
+            self.inside_zone = inside
+            await self.send_json({'type': 'zone_status', 'inside': inside})
+
+        await self.channel_layer.group_send(self.group_name, {
+            'type': 'player_location',
+            'sender': self.channel_name,
+            'data': {
+                'type': 'player_location',
+                'player_id': self.player.id,
+                'user_id': self.player.user_id,
+                'latitude': latitude,
+                'longitude': longitude,
+            }
+        })
+
+    async def handle_chat_message(self, content):
+        text = (content.get('message') or '').strip()
+        if not text:
+            return
+
+        message = await self.create_chat_message(text)
+        await self.channel_layer.group_send(self.group_name, {
+            'type': 'game_update',
+            'data': {
+                'type': 'chat_message',
+                'message': {
+                    'id': message.id,
+                    'content': message.content,
+                    'username': self.scope['user'].username,
+                    'created_at': message.created_at.isoformat(),
+                }
+            }
+        })
+
+    # Channel layer handlers
+
+    async def game_update(self, event):
+        if event['data'].get('type') == 'area_stage':
+            # The zone moved on, reload it for the point-in-area checks
+            self.game = await self.get_game() or self.game
+        await self.send_json(event['data'])
+
+    async def player_location(self, event):
+        # Players already know where they are, don't echo their own fixes back
+        if event.get('sender') == self.channel_name:
+            return
+        await self.send_json(event['data'])
+
+    # Database helpers
+
+    @database_sync_to_async
+    def get_player(self, user):
+        return GamePlayer.objects.filter(game_id=self.game_id, user=user).select_related('game').first()
+
+    @database_sync_to_async
+    def get_game(self):
+        return Game.objects.only('center', 'radius', 'current_area').filter(id=self.game_id).first()
+
+    @database_sync_to_async
+    def create_chat_message(self, text):
+        return ChatMessage.objects.create(
+            game_id=self.game_id,
+            user=self.scope['user'],
+            content=text
+        )
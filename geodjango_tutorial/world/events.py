@@ -0,0 +1,77 @@
+import asyncio
+import time
+
+from channels.layers import get_channel_layer
+from asgiref.sync import async_to_sync
+
+
+def game_group_name(game_id):
+    """Channel layer group that every socket connected to a game joins"""
+    return f'game_{game_id}'
+
+
+def send_game_event(game_id, data):
+    """Push an event to every client connected to the game's WebSocket group"""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    async_to_sync(channel_layer.group_send)(
+        game_group_name(game_id),
+        {
+            'type': 'game_update',
+            'data': data
+        }
+    )
+
+
+# Chat long-polling. Readers waiting for new messages don't poll the database:
+# every new message is announced on the game's chat group, and waiters only
+# query once an announced id is past the last message they have.
+
+def chat_group_name(game_id):
+    """Channel layer group that async chat long-polls wait on"""
+    return f'chat_{game_id}'
+
+
+def notify_chat_message(game_id, message_id):
+    """Wake chat long-polls of the game, call once the message is committed"""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    async_to_sync(channel_layer.group_send)(
+        chat_group_name(game_id),
+        {'type': 'chat.message', 'id': message_id}
+    )
+
+
+async def wait_for_chat_message(game_id, after_id, timeout, check):
+    """Wait up to timeout seconds for a message newer than after_id.
+
+    ``check`` is an async callable returning the new messages (or an empty
+    list). It runs once after subscribing, so a message committed just before
+    the wait started isn't missed, and again on every notification of a newer
+    id. Returns the last result of ``check``.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return await check()
+
+    group = chat_group_name(game_id)
+    channel = await channel_layer.new_channel()
+    await channel_layer.group_add(group, channel)
+    try:
+        result = await check()
+        deadline = time.monotonic() + timeout
+        while not result:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                event = await asyncio.wait_for(channel_layer.receive(channel), remaining)
+            except asyncio.TimeoutError:
+                break
+            if event.get('id', 0) > after_id:
+                result = await check()
+        return result
+    finally:
+        await channel_layer.group_discard(group, channel)
@@ -0,0 +1,150 @@
+"""
+Read-only fast path for the game and chat serializers.
+
+DRF serializers build a field tree and walk it per instance. For the hot read
+endpoints the output is built directly from ``.values()`` rows by the plain
+functions below instead, producing exactly what GameSerializer,
+GameListSerializer and ChatMessageSerializer produce. Enabled with the
+FAST_SERIALIZERS setting, see the benchmark_serializers command for the
+difference it makes.
+"""
+
+from collections import namedtuple
+from decimal import Decimal
+
+from django.utils import timezone
+
+from .areas import area_representation
+from .models import GamePlayer
+from .serializers import center_geojson
+
+TEAM_NAMES = dict(GamePlayer.TEAM_CHOICES)
+CENTS = Decimal('0.01')
+
+GAME_FIELDS = (
+    'id', 'status', 'host_id', 'host__username', 'current_area', 'radius',
+    'kitty_value_per_player', 'total_kitty', 'center', 'area_set',
+    'player_count', 'team_sizes', 'started_at', 'shrink_schedule', 'current_stage',
+)
+GAME_LIST_FIELDS = (
+    'id', 'status', 'host_id', 'host__username', 'player_count', 'radius',
+    'kitty_value_per_player', 'total_kitty', 'center', 'area_set', 'created_at',
+)
+PLAYER_FIELDS = ('id', 'game_id', 'user_id', 'user__username', 'team')
+CHAT_FIELDS = ('id', 'content', 'user__username', 'created_at')
+
+# What area_representation reads from a game
+AreaSource = namedtuple('AreaSource', ['center', 'radius', 'current_area'])
+
+
+def _decimal(value):
+    # DRF renders decimals as fixed point strings with the field's places
+    return None if value is None else f'{value.quantize(CENTS):f}'
+
+
+def _datetime(value):
+    # Same output as DRF's DateTimeField: ISO 8601 in the current time zone,
+    # with UTC written as Z
+    if value is None:
+        return None
+    value = timezone.localtime(value).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def _host(row):
+    if row['host_id'] is None:
+        return None
+    return {'id': row['host_id'], 'username': row['host__username']}
+
+
+def player(row):
+    return {
+        'id': row['id'],
+        'user': {'id': row['user_id'], 'username': row['user__username']},
+        'team': row['team'],
+        'username': row['user__username'],
+        'team_name': TEAM_NAMES.get(row['team'], 'Unknown Team'),
+    }
+
+
+def game_detail(row, players, area_format=None):
+    """GameSerializer output for a GAME_FIELDS row and its PLAYER_FIELDS rows"""
+    return {
+        'id': row['id'],
+        'status': row['status'],
+        'host': _host(row),
+        'players': [player(p) for p in players],
+        'current_area': area_representation(
+            AreaSource(row['center'], row['radius'], row['current_area']), area_format
+        ),
+        'radius': row['radius'],
+        'kitty_value_per_player': _decimal(row['kitty_value_per_player']),
+        'total_kitty': _decimal(row['total_kitty']),
+        'center': center_geojson(row['center']),
+        'area_set': row['area_set'],
+        'player_count': row['player_count'],
+        'team_sizes': row['team_sizes'],
+        'started_at': _datetime(row['started_at']),
+        'shrink_schedule': row['shrink_schedule'],
+        'current_stage': row['current_stage'],
+    }
+
+
+def game_list_item(row):
+    """GameListSerializer output for a GAME_LIST_FIELDS row"""
+    return {
+        'id': row['id'],
+        'status': row['status'],
+        'host': _host(row),
+        'player_count': row['player_count'],
+        'radius': row['radius'],
+        'kitty_value_per_player': _decimal(row['kitty_value_per_player']),
+        'total_kitty': _decimal(row['total_kitty']),
+        'center': center_geojson(row['center']),
+        'area_set': row['area_set'],
+        'created_at': _datetime(row['created_at']),
+    }
+
+
+def chat_message(row):
+    """ChatMessageSerializer output for a CHAT_FIELDS row"""
+    return {
+        'id': row['id'],
+        'content': row['content'],
+        'username': row['user__username'],
+        'created_at': _datetime(row['created_at']),
+    }
+
+
+def player_rows(game_ids):
+    return (
+        GamePlayer.objects.filter(game_id__in=game_ids)
+        .order_by('id')
+        .values(*PLAYER_FIELDS)
+    )
+
+
+def _group_players(rows):
+    players = {}
+    for row in rows:
+        players.setdefault(row['game_id'], []).append(row)
+    return players
+
+
+def game_details(queryset, area_format=None):
+    """GameSerializer(many=True) output for a Game queryset, in two queries"""
+    # Players are fetched separately, a prefetch can't run on .values() rows
+    games = list(queryset.prefetch_related(None).values(*GAME_FIELDS))
+    players = _group_players(player_rows([g['id'] for g in games]))
+    return [game_detail(g, players.get(g['id'], []), area_format) for g in games]
+
+
+async def agame_detail(queryset, area_format=None):
+    """GameSerializer output for the first game of a queryset, None if empty"""
+    row = await queryset.prefetch_related(None).values(*GAME_FIELDS).afirst()
+    if row is None:
+        return None
+    players = [p async for p in player_rows([row['id']])]
+    return game_detail(row, players, area_format)
@@ -0,0 +1,63 @@
+"""Small geodesy helpers shared by the game engines"""
+
+import math
+
+import numpy as np
+
+# Mean Earth radius (IUGG), in metres
+EARTH_RADIUS_M = 6371008.8
+
+
+def haversine_m(lng1, lat1, lng2, lat2):
+    """Great circle distance in metres between two lng/lat points"""
+    lng1, lat1, lng2, lat2 = map(math.radians, (lng1, lat1, lng2, lat2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def destination(lng, lat, bearing, distance_m):
+    """Point reached from lng/lat after distance_m along bearing (radians from north)"""
+    lat1 = math.radians(lat)
+    lng1 = math.radians(lng)
+    d = distance_m / EARTH_RADIUS_M
+    lat2 = math.asin(math.sin(lat1) * math.cos(d) + math.cos(lat1) * math.sin(d) * math.cos(bearing))
+    lng2 = lng1 + math.atan2(
+        math.sin(bearing) * math.sin(d) * math.cos(lat1),
+        math.cos(d) - math.sin(lat1) * math.sin(lat2)
+    )
+    return math.degrees(lng2), math.degrees(lat2)
+
+
+def haversine_np(lng1, lat1, lng2, lat2):
+    """Vectorised haversine, takes arrays (or scalars) and returns metres"""
+    lng1, lat1, lng2, lat2 = (np.radians(np.asarray(v, dtype=float)) for v in (lng1, lat1, lng2, lat2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+
+def bbox_around(lng, lat, radius_m):
+    """(xmin, ymin, xmax, ymax) in degrees that encloses a circle of radius_m"""
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    dlng = dlat / max(math.cos(math.radians(lat)), 1e-6)
+    return (lng - dlng, max(lat - dlat, -90.0), lng + dlng, min(lat + dlat, 90.0))
+
+
+def _round_coords(coords, precision):
+    if coords and isinstance(coords[0], (int, float)):
+        return [round(c, precision) for c in coords]
+    return [_round_coords(c, precision) for c in coords]
+
+
+def geometry_to_geojson(geom, precision=None, simplify=None):
+    """GeoJSON dict for a GEOS geometry with coordinates rounded to precision
+    decimal places, optionally simplified by a tolerance in degrees first"""
+    if geom is None:
+        return None
+    if simplify:
+        geom = geom.simplify(simplify, preserve_topology=True)
+    coords = geom.coords
+    if precision is not None:
+        coords = _round_coords(coords, precision)
+    return {'type': geom.geom_type, 'coordinates': coords}
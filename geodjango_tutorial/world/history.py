@@ -0,0 +1,145 @@
+"""
+Location history storage and replay.
+
+Every accepted fix of a game's players is appended to LocationHistory, a table
+range partitioned by day on recorded_at. Rows are written by the ingest buffer
+with a single ``COPY`` per flush, and read back in time order with keyset
+pagination so a replay never holds more than one chunk of a game in memory.
+Once a finished game has been compacted (see world.tracks) the replay reads
+the simplified tracks instead.
+"""
+
+import datetime
+import io
+import json
+
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.db.models import Q
+
+from .models import LocationHistory, PlayerTrack
+from .tracks import track_chunks
+
+REPLAY_CHUNK_SIZE = 2000
+
+_partitions = set()
+
+
+def partition_name(day):
+    return f'{LocationHistory._meta.db_table}_p{day:%Y%m%d}'
+
+
+def ensure_partitions(days):
+    """Create the daily partitions for the given dates if they don't exist yet"""
+    table = LocationHistory._meta.db_table
+    missing = [day for day in days if day not in _partitions]
+    if not missing:
+        return
+    with connection.cursor() as cursor:
+        for day in missing:
+            cursor.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {partition_name(day)}
+                PARTITION OF {table}
+                FOR VALUES FROM (%s) TO (%s)
+                """,
+                [day.isoformat(), (day + datetime.timedelta(days=1)).isoformat()]
+            )
+            _partitions.add(day)
+
+
+def _copy_value(value):
+    return r'\N' if value is None else str(value)
+
+
+def copy_fixes(fixes):
+    """Append (game_id, player_id, timestamp, lng, lat, accuracy) fixes with COPY"""
+    if not fixes:
+        return 0
+
+    today = datetime.datetime.now(datetime.timezone.utc).date()
+    ensure_partitions([today, today + datetime.timedelta(days=1)])
+
+    buf = io.StringIO()
+    for game_id, player_id, ts, lng, lat, accuracy in fixes:
+        recorded_at = datetime.datetime.fromtimestamp(ts, datetime.timezone.utc)
+        buf.write('\t'.join((
+            str(game_id),
+            str(player_id),
+            recorded_at.isoformat(),
+            f'SRID=4326;POINT({lng!r} {lat!r})',
+            _copy_value(accuracy),
+        )))
+        buf.write('\n')
+    buf.seek(0)
+
+    table = LocationHistory._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.cursor.copy_expert(
+            f'COPY {table} (game_id, player_id, recorded_at, location, accuracy) FROM STDIN',
+            buf
+        )
+    return len(fixes)
+
+
+def history_chunks(game_id, since=None, until=None, chunk_size=REPLAY_CHUNK_SIZE):
+    """Yield a game's raw history as lists of replay rows in time order.
+
+    Replay rows are (recorded_at, player_id, user_id, lng, lat, accuracy).
+    """
+    rows = LocationHistory.objects.filter(game_id=game_id)
+    if since is not None:
+        rows = rows.filter(recorded_at__gte=since)
+    if until is not None:
+        rows = rows.filter(recorded_at__lt=until)
+    rows = rows.order_by('recorded_at', 'id').values_list(
+        'id', 'recorded_at', 'player_id', 'player__user_id', 'location', 'accuracy'
+    )
+
+    last = None
+    while True:
+        page = rows
+        if last is not None:
+            page = page.filter(
+                Q(recorded_at__gt=last[1]) | Q(recorded_at=last[1], id__gt=last[0])
+            )
+        chunk = list(page[:chunk_size])
+        if not chunk:
+            return
+        yield [
+            (recorded_at, player_id, user_id, location.x, location.y, accuracy)
+            for _, recorded_at, player_id, user_id, location, accuracy in chunk
+        ]
+        if len(chunk) < chunk_size:
+            return
+        last = chunk[-1]
+
+
+def replay_chunks(game_id, since=None, until=None, chunk_size=REPLAY_CHUNK_SIZE):
+    """Replay rows of a game, from its compacted tracks once it has any"""
+    if PlayerTrack.objects.filter(game_id=game_id).exists():
+        return track_chunks(game_id, since, until, chunk_size)
+    return history_chunks(game_id, since, until, chunk_size)
+
+
+def replay_line(row):
+    recorded_at, player_id, user_id, lng, lat, accuracy = row
+    return json.dumps({
+        'recorded_at': recorded_at.isoformat(),
+        'player_id': player_id,
+        'user_id': user_id,
+        'latitude': lat,
+        'longitude': lng,
+        'accuracy': accuracy,
+    }) + '\n'
+
+
+async def areplay_lines(game_id, since=None, until=None, chunk_size=REPLAY_CHUNK_SIZE):
+    """NDJSON lines of a game's history, fetching one chunk at a time"""
+    chunks = await sync_to_async(replay_chunks)(game_id, since, until, chunk_size)
+    next_chunk = sync_to_async(lambda: next(chunks, None))
+    while True:
+        chunk = await next_chunk()
+        if chunk is None:
+            return
+        yield ''.join(replay_line(row) for row in chunk)
@@ -0,0 +1,180 @@
+"""
+Batched location ingest.
+
+GPS fixes arrive far more often than we need to write them. Instead of saving a
+row per fix, fixes are buffered in memory keyed by player, so only the latest
+fix per player survives until the next flush, and each flush writes all
+buffered players with a single ``bulk_update``. Fixes made in a game are also
+kept in full and appended to the location history with one ``COPY`` per flush.
+
+Before a fix is buffered it goes through a dead-band filter: fixes that land
+within the noise radius of the last accepted fix, or that would need an
+impossible speed to reach, are dropped. A player standing still then costs no
+writes and no fan-out at all.
+"""
+
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.gis.geos import Point
+from django.db import close_old_connections
+
+from .geo import haversine_m
+
+logger = logging.getLogger(__name__)
+
+
+class FixFilter:
+    """Dead-band and speed filter over the last accepted fix per key.
+
+    A fix is accepted when nothing is known about the key yet, when it is
+    clearly more accurate than the last accepted fix, or when it moved further
+    than the noise radius (the larger of LOCATION_MIN_MOVE and the reported
+    accuracies) at no more than LOCATION_MAX_SPEED. Fixes worse than
+    LOCATION_MAX_ACCURACY are rejected once a better one is known.
+    """
+
+    def __init__(self):
+        self._last = {}
+
+    def accept(self, key, longitude, latitude, accuracy, now):
+        last = self._last.get(key)
+        if last is None or self._informative(last, longitude, latitude, accuracy, now):
+            self._last[key] = (longitude, latitude, accuracy, now)
+            return True
+        return False
+
+    def _informative(self, last, longitude, latitude, accuracy, now):
+        last_lng, last_lat, last_accuracy, last_ts = last
+        if accuracy is not None and accuracy > settings.LOCATION_MAX_ACCURACY:
+            return False
+        if accuracy is not None and (last_accuracy is None or accuracy < last_accuracy / 2):
+            return True
+
+        noise = max(settings.LOCATION_MIN_MOVE, accuracy or 0, last_accuracy or 0)
+        distance = haversine_m(last_lng, last_lat, longitude, latitude)
+        if distance <= noise:
+            return False
+
+        # Allow for the error of both fixes before judging the speed
+        elapsed = max(now - last_ts, 1e-3)
+        moved = distance - (accuracy or 0) - (last_accuracy or 0)
+        return moved / elapsed <= settings.LOCATION_MAX_SPEED
+
+    def prune(self, older_than):
+        """Forget keys whose last accepted fix is older than the given time"""
+        self._last = {key: fix for key, fix in self._last.items() if fix[3] >= older_than}
+
+
+class LocationBuffer:
+    """Coalesces location fixes and flushes them on a fixed interval"""
+
+    def __init__(self, interval=None):
+        self.interval = interval
+        self._players = {}
+        self._profiles = {}
+        self._history = []
+        self._filter = FixFilter()
+        self._lock = threading.Lock()
+        self._thread = None
+        atexit.register(self.flush)
+
+    def get_interval(self):
+        if self.interval is not None:
+            return self.interval
+        return settings.LOCATION_FLUSH_INTERVAL
+
+    def add_player_fix(self, player_id, latitude, longitude, accuracy=None, game_id=None):
+        """Queue a fix for a GamePlayer, replacing any unflushed fix.
+
+        With game_id the fix is also recorded in the game's location history.
+        Returns False if the filter dropped the fix.
+        """
+        now = time.time()
+        with self._lock:
+            if not self._filter.accept(('player', player_id), longitude, latitude, accuracy, now):
+                return False
+            self._players[player_id] = (longitude, latitude, accuracy, now)
+            if game_id is not None:
+                self._history.append((game_id, player_id, now, longitude, latitude, accuracy))
+        self._ensure_running()
+        return True
+
+    def add_profile_fix(self, user_id, latitude, longitude, accuracy=None):
+        """Queue a fix for a user's Profile, replacing any unflushed fix.
+
+        Returns False if the filter dropped the fix.
+        """
+        now = time.time()
+        with self._lock:
+            if not self._filter.accept(('profile', user_id), longitude, latitude, accuracy, now):
+                return False
+            self._profiles[user_id] = (longitude, latitude, accuracy, now)
+        self._ensure_running()
+        return True
+
+    def flush(self):
+        """Write every buffered fix to the database, returns the number written"""
+        from .models import GamePlayer, Profile
+        from .history import copy_fixes
+
+        with self._lock:
+            players, self._players = self._players, {}
+            profiles, self._profiles = self._profiles, {}
+            history, self._history = self._history, []
+            self._filter.prune(time.time() - settings.LOCATION_FILTER_TTL)
+
+        if players:
+            GamePlayer.objects.bulk_update(
+                [
+                    GamePlayer(id=player_id, location=Point(lng, lat, srid=4326))
+                    for player_id, (lng, lat, accuracy, ts) in players.items()
+                ],
+                ['location'],
+                batch_size=500
+            )
+
+        if profiles:
+            Profile.objects.bulk_create(
+                [
+                    Profile(user_id=user_id, location=Point(lng, lat, srid=4326), accuracy=accuracy)
+                    for user_id, (lng, lat, accuracy, ts) in profiles.items()
+                ],
+                update_conflicts=True,
+                unique_fields=['user'],
+                update_fields=['location', 'accuracy'],
+                batch_size=500
+            )
+
+        if history:
+            copy_fixes(history)
+
+        return len(players) + len(profiles)
+
+    def _ensure_running(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run, name='location-ingest', daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.get_interval())
+            try:
+                close_old_connections()
+                self.flush()
+            except Exception:
+                logger.exception('Failed to flush buffered locations')
+            finally:
+                close_old_connections()
+
+
+location_buffer = LocationBuffer()
@@ -0,0 +1,42 @@
+"""
+Non-blocking log output.
+
+Log records are put on an in-memory queue by a QueueHandler and written by a
+QueueListener thread, so a request never waits on stdout. The handler is built
+by ``background_handler``, referenced from the LOGGING setting. Levels are set
+per module there, and messages use %-style arguments so that disabled levels
+cost a level check and nothing else.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+
+DEFAULT_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+
+
+def background_handler(format=DEFAULT_FORMAT, stream=None, maxsize=10000):
+    """QueueHandler whose records are written by a background listener thread.
+
+    Records that don't fit in a full queue are dropped rather than blocking
+    the caller.
+    """
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(logging.Formatter(format))
+
+    records = queue.Queue(maxsize)
+    listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    return DroppingQueueHandler(records)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
@@ -0,0 +1,95 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from world import fast_serializers
+from world.models import ChatMessage, Game
+from world.renderers import ORJSONRenderer
+from world.serializers import ChatMessageSerializer, GameListSerializer, GameSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compare rows/second of the DRF serializers and the fast .values() serializers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--games', type=int, default=100,
+                            help='Number of games to serialize per iteration')
+        parser.add_argument('--messages', type=int, default=200,
+                            help='Number of chat messages to serialize per iteration')
+        parser.add_argument('--iterations', type=int, default=20)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        game_ids = list(
+            Game.objects.order_by('-created_at').values_list('id', flat=True)[:options['games']]
+        )
+        if not game_ids:
+            raise CommandError('No games to serialize, create some first')
+        message_ids = list(
+            ChatMessage.objects.order_by('-id').values_list('id', flat=True)[:options['messages']]
+        )
+
+        def games():
+            return Game.objects.filter(id__in=game_ids).order_by('-created_at', 'id')
+
+        def messages():
+            return ChatMessage.objects.filter(id__in=message_ids).select_related('user').order_by('id')
+
+        # Each case is (name, rows per run, DRF path, fast path), and each path
+        # runs the queries as well as building the output
+        cases = [
+            (
+                'game detail', len(game_ids),
+                lambda: GameSerializer(
+                    GameSerializer.setup_eager_loading(games()), many=True
+                ).data,
+                lambda: fast_serializers.game_details(games()),
+            ),
+            (
+                'game list', len(game_ids),
+                lambda: GameListSerializer(
+                    GameListSerializer.setup_eager_loading(games()), many=True
+                ).data,
+                lambda: [
+                    fast_serializers.game_list_item(row)
+                    for row in games().values(*fast_serializers.GAME_LIST_FIELDS)
+                ],
+            ),
+        ]
+        if message_ids:
+            cases.append((
+                'chat', len(message_ids),
+                lambda: ChatMessageSerializer(messages(), many=True).data,
+                lambda: [
+                    fast_serializers.chat_message(row)
+                    for row in messages().values(*fast_serializers.CHAT_FIELDS)
+                ],
+            ))
+
+        self.stdout.write(f'{iterations} iterations per case\n')
+        for name, rows, drf_path, fast_path in cases:
+            drf_rate, drf_data = self.measure(drf_path, rows, iterations)
+            fast_rate, fast_data = self.measure(fast_path, rows, iterations)
+            if fast_data != drf_data:
+                self.stderr.write(f'{name}: fast serializer output differs from DRF')
+            self.stdout.write(
+                f'{name:<12} drf {drf_rate:>10.0f} rows/s   '
+                f'fast {fast_rate:>10.0f} rows/s   x{fast_rate / drf_rate:.1f}'
+            )
+
+            json_rate, _ = self.measure(lambda: JSONRenderer().render(fast_data), rows, iterations)
+            orjson_rate, _ = self.measure(lambda: ORJSONRenderer().render(fast_data), rows, iterations)
+            self.stdout.write(
+                f'{"":<12} json {json_rate:>9.0f} rows/s   '
+                f'orjson {orjson_rate:>8.0f} rows/s   x{orjson_rate / json_rate:.1f}'
+            )
+
+    def measure(self, path, rows, iterations):
+        """Rows per second of path, and its last output"""
+        data = path()  # warm up
+        start = time.perf_counter()
+        for _ in range(iterations):
+            data = path()
+        elapsed = time.perf_counter() - start
+        return rows * iterations / elapsed, data
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from world.tracks import compact_game, games_to_compact
+
+
+class Command(BaseCommand):
+    help = "Simplify finished games' location history into one track per player"
+
+    def add_arguments(self, parser):
+        parser.add_argument('game_ids', nargs='*', type=int,
+                            help='Games to compact (default: every finished game with raw history)')
+        parser.add_argument('--tolerance', type=float,
+                            help='Simplification tolerance in metres (default: TRACK_SIMPLIFY_TOLERANCE)')
+
+    def handle(self, *args, **options):
+        game_ids = options['game_ids'] or games_to_compact()
+        for game_id in game_ids:
+            tracks, dropped = compact_game(game_id, options['tolerance'])
+            self.stdout.write(f'Game {game_id}: {tracks} tracks, {dropped} raw fixes dropped')
@@ -0,0 +1,23 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from world.ticker import GameTicker
+
+
+class Command(BaseCommand):
+    help = 'Run the game tick scheduler (area reductions and capture checks)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--capture-interval', type=float,
+                            help='Seconds between capture checks for each active game')
+
+    def handle(self, *args, **options):
+        ticker = GameTicker(
+            capture_interval=options['capture_interval'],
+        )
+        self.stdout.write('Game ticker running')
+        try:
+            asyncio.run(ticker.run())
+        except KeyboardInterrupt:
+            self.stdout.write('Game ticker stopped')
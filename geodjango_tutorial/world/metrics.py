@@ -0,0 +1,120 @@
+"""
+In-process request metrics.
+
+InstrumentationMiddleware appends one sample per (sampled) request to a fixed
+size ring buffer. Nothing is aggregated on the request path; the metrics
+endpoint summarises the buffer into per-view latency histograms, query counts
+and response sizes when it is asked for them.
+"""
+
+import time
+from collections import deque, namedtuple
+
+from django.conf import settings
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+Sample = namedtuple(
+    'Sample', ['view', 'method', 'status', 'duration_ms', 'queries', 'query_ms', 'size', 'timestamp']
+)
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class QueryCounter:
+    """connection.execute_wrapper that counts queries and their time"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+
+class MetricsBuffer:
+    def __init__(self, size=None):
+        self.samples = deque(maxlen=size or getattr(settings, 'INSTRUMENTATION_BUFFER_SIZE', 10000))
+
+    def record(self, sample):
+        # deque.append is atomic, no lock needed on the request path
+        self.samples.append(sample)
+
+    def clear(self):
+        self.samples.clear()
+
+    def summary(self):
+        views = {}
+        for sample in list(self.samples):
+            views.setdefault(sample.view, []).append(sample)
+        return {view: summarise(samples) for view, samples in sorted(views.items())}
+
+
+def _percentile(values, fraction):
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def summarise(samples):
+    durations = sorted(s.duration_ms for s in samples)
+    histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+    for duration in durations:
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if duration <= bound:
+                histogram[i] += 1
+                break
+        else:
+            histogram[-1] += 1
+
+    sizes = [s.size for s in samples if s.size is not None]
+    statuses = {}
+    for s in samples:
+        statuses[s.status] = statuses.get(s.status, 0) + 1
+
+    count = len(samples)
+    return {
+        'count': count,
+        'statuses': statuses,
+        'latency_ms': {
+            'mean': sum(durations) / count,
+            'p50': _percentile(durations, 0.5),
+            'p95': _percentile(durations, 0.95),
+            'p99': _percentile(durations, 0.99),
+            'max': durations[-1],
+            'buckets': [f'<={bound}' for bound in LATENCY_BUCKETS_MS] + ['inf'],
+            'histogram': histogram,
+        },
+        'queries': {
+            'mean': sum(s.queries for s in samples) / count,
+            'max': max(s.queries for s in samples),
+            'mean_ms': sum(s.query_ms for s in samples) / count,
+        },
+        'response_bytes': {
+            'mean': sum(sizes) / len(sizes) if sizes else None,
+            'max': max(sizes) if sizes else None,
+        },
+    }
+
+
+metrics_buffer = MetricsBuffer()
+
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAdminUser])
+def metrics_view(request):
+    """Per-view summary of the sampled requests; DELETE clears the buffer"""
+    if request.method == 'DELETE':
+        metrics_buffer.clear()
+        return Response(status=204)
+    return Response({
+        'enabled': getattr(settings, 'INSTRUMENTATION_ENABLED', False),
+        'sample_rate': getattr(settings, 'INSTRUMENTATION_SAMPLE_RATE', 1.0),
+        'samples': len(metrics_buffer.samples),
+        'views': metrics_buffer.summary(),
+    })
@@ -1,16 +1,106 @@
-class DebugMiddleware:
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+from .metrics import QueryCounter, Sample, metrics_buffer
+
+
+class InstrumentationMiddleware:
+    """Record latency, DB queries and response size of sampled requests.
+
+    Off unless INSTRUMENTATION_ENABLED is set; when it is unset Django drops the
+    middleware at startup and it costs nothing. It runs sync or async to match
+    the rest of the stack, so under ASGI it doesn't put a thread switch in
+    front of the async views. Samples go to the in-process ring buffer in
+    world.metrics. The request's user and session are never touched, so token
+    authenticated requests don't load them.
+    """
+
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
+        if not getattr(settings, 'INSTRUMENTATION_ENABLED', False):
+            raise MiddlewareNotUsed
         self.get_response = get_response
+        self.sample_rate = getattr(settings, 'INSTRUMENTATION_SAMPLE_RATE', 1.0)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-        print("\n=== Request Debug ===")
-        print("Path:", request.path)
-        print("Method:", request.method)
-        print("Session ID:", getattr(request, 'session', {}).get('session_key', 'No session'))
-        print("User:", getattr(request, 'user', 'No user'))
-        print("Authenticated:", getattr(request, 'user', None) and request.user.is_authenticated)
-        print("Cookies:", request.COOKIES)
-        print("===================\n")
-        
-        response = self.get_response(request)
-        return response 
\ No newline at end of file
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+
+        counter = QueryCounter()
+        start = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - start, counter)
+        return response
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+
+        # The async ORM runs queries in a worker thread with this request's
+        # context, which resolves to the same connection and its wrappers
+        counter = QueryCounter()
+        start = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            response = await self.get_response(request)
+        self.record(request, response, time.perf_counter() - start, counter)
+        return response
+
+    def sampled(self):
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def record(self, request, response, duration, counter):
+        match = request.resolver_match
+        metrics_buffer.record(Sample(
+            view=match.view_name if match else 'unresolved',
+            method=request.method,
+            status=response.status_code,
+            duration_ms=duration * 1000,
+            queries=counter.count,
+            query_ms=counter.seconds * 1000,
+            size=None if response.streaming else len(response.content),
+            timestamp=time.time(),
+        ))
+
+
+class TokenAuthMiddleware:
+    """Authenticate WebSocket connections from a ``?token=`` query parameter.
+
+    Browsers cannot set an Authorization header on a WebSocket handshake, so the
+    mobile client passes its DRF token in the query string instead. It sits
+    inside AuthMiddlewareStack: a token replaces the session user in the scope,
+    connections without a token keep the session user.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        from urllib.parse import parse_qs
+
+        query = parse_qs(scope.get('query_string', b'').decode())
+        token_key = query.get('token', [None])[0]
+        if token_key:
+            scope = dict(scope, user=await get_token_user(token_key))
+        return await self.app(scope, receive, send)
+
+
+async def get_token_user(token_key):
+    from django.contrib.auth.models import AnonymousUser
+    from .authentication import aget_token_user
+
+    user = await aget_token_user(token_key)
+    if user is None or not user.is_active:
+        return AnonymousUser()
+    return user
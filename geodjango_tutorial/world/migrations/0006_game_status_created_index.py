@@ -0,0 +1,17 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("world", "0005_alter_game_kitty_value_per_player_and_more"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="game",
+            index=models.Index(
+                fields=["status", "-created_at"], name="world_game_status_created"
+            ),
+        ),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_derived_fields(apps, schema_editor):
+    Game = apps.get_model("world", "Game")
+    GamePlayer = apps.get_model("world", "GamePlayer")
+
+    sizes = {}
+    rows = GamePlayer.objects.values_list("game_id", "team").annotate(size=Count("id")).order_by()
+    for game_id, team, size in rows:
+        sizes.setdefault(game_id, {})[str(team)] = size
+
+    games = list(Game.objects.filter(id__in=sizes))
+    for game in games:
+        game.team_sizes = sizes[game.id]
+        game.player_count = sum(game.team_sizes.values())
+    Game.objects.bulk_update(games, ["player_count", "team_sizes"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("world", "0008_kittytransaction"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="game",
+            name="player_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="game",
+            name="team_sizes",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.RunPython(backfill_derived_fields, migrations.RunPython.noop),
+    ]
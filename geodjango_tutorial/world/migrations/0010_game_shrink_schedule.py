@@ -0,0 +1,26 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("world", "0009_game_player_count_team_sizes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="game",
+            name="started_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="game",
+            name="shrink_schedule",
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name="game",
+            name="current_stage",
+            field=models.IntegerField(default=0),
+        ),
+    ]
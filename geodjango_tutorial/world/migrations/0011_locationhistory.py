@@ -0,0 +1,94 @@
+import django.contrib.gis.db.models.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Django can't create partitioned tables, so the table is created by hand and
+# the model state is kept in sync separately. Postgres requires the partition
+# key in the primary key, hence (id, recorded_at). Daily partitions are created
+# ahead of time by world.history.ensure_partitions, anything else lands in the
+# default partition.
+CREATE_TABLE = """
+CREATE TABLE world_locationhistory (
+    id bigint GENERATED BY DEFAULT AS IDENTITY,
+    game_id bigint NOT NULL
+        REFERENCES world_game (id) DEFERRABLE INITIALLY DEFERRED,
+    player_id bigint NOT NULL
+        REFERENCES world_gameplayer (id) DEFERRABLE INITIALLY DEFERRED,
+    recorded_at timestamp with time zone NOT NULL,
+    location geometry(Point, 4326) NOT NULL,
+    accuracy double precision NULL,
+    PRIMARY KEY (id, recorded_at)
+) PARTITION BY RANGE (recorded_at);
+
+CREATE TABLE world_locationhistory_default
+    PARTITION OF world_locationhistory DEFAULT;
+
+CREATE INDEX world_lochist_game_time
+    ON world_locationhistory (game_id, recorded_at, id);
+CREATE INDEX world_locationhistory_player_id
+    ON world_locationhistory (player_id);
+"""
+
+DROP_TABLE = "DROP TABLE IF EXISTS world_locationhistory CASCADE;"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("world", "0010_game_shrink_schedule"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(CREATE_TABLE, DROP_TABLE),
+            ],
+            state_operations=[
+                migrations.CreateModel(
+                    name="LocationHistory",
+                    fields=[
+                        (
+                            "id",
+                            models.BigAutoField(
+                                auto_created=True,
+                                primary_key=True,
+                                serialize=False,
+                                verbose_name="ID",
+                            ),
+                        ),
+                        ("recorded_at", models.DateTimeField()),
+                        (
+                            "location",
+                            django.contrib.gis.db.models.fields.PointField(srid=4326),
+                        ),
+                        ("accuracy", models.FloatField(blank=True, null=True)),
+                        (
+                            "game",
+                            models.ForeignKey(
+                                on_delete=django.db.models.deletion.CASCADE,
+                                related_name="location_history",
+                                to="world.game",
+                            ),
+                        ),
+                        (
+                            "player",
+                            models.ForeignKey(
+                                on_delete=django.db.models.deletion.CASCADE,
+                                related_name="location_history",
+                                to="world.gameplayer",
+                            ),
+                        ),
+                    ],
+                    options={
+                        "indexes": [
+                            models.Index(
+                                fields=["game", "recorded_at", "id"],
+                                name="world_lochist_game_time",
+                            )
+                        ],
+                    },
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,52 @@
+import django.contrib.gis.db.models.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("world", "0011_locationhistory"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PlayerTrack",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "path",
+                    django.contrib.gis.db.models.fields.LineStringField(dim=3, srid=4326),
+                ),
+                ("raw_points", models.IntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "game",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="tracks",
+                        to="world.game",
+                    ),
+                ),
+                (
+                    "player",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="tracks",
+                        to="world.gameplayer",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("game", "player")},
+            },
+        ),
+    ]
@@ -5,6 +5,16 @@ from django.contrib.gis.geos import Point
 from django.utils import timezone
 from django.db.models.signals import post_save, m2m_changed, post_delete
 from django.dispatch import receiver
+from django.db import connection, transaction
+from django.db.models import Count, DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from decimal import Decimal
+import logging
+import threading
+from .cache import invalidate_game_state
+from .areas import circle_polygon
+
+logger = logging.getLogger(__name__)
 
 class WorldBorder(models.Model):
 
@@ -71,26 +81,15 @@ class Profile(models.Model):
     
 
 def set_user_location(user_id, latitude, longitude, accuracy=None):
+    """Queue a location fix for the user's profile.
 
-    user = User.objects.get(id=user_id)
-
-    location = Point(longitude, latitude)  # Point takes (longitude, latitude)
-
-   
-
-    # Create or update the user's profile
-
-    profile, created = Profile.objects.get_or_create(user=user)
-
-    profile.location = location
+    Fixes are filtered and coalesced in world.ingest and written in batches, so
+    the profile row is created or updated on the next flush rather than
+    immediately. Returns False if the fix carried no new information.
+    """
+    from .ingest import location_buffer
 
-    profile.accuracy = accuracy
-
-    profile.save()
-
-   
-
-    return profile
+    return location_buffer.add_profile_fix(user_id, latitude, longitude, accuracy)
 
 class LocationNote(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -103,6 +102,16 @@ class LocationNote(models.Model):
     def __str__(self):
         return f"{self.title} by {self.user.username}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        from .tiles import invalidate_extent
+        invalidate_extent('notes', self.location.extent)
+
+    def delete(self, *args, **kwargs):
+        from .tiles import invalidate_extent
+        invalidate_extent('notes', self.location.extent)
+        return super().delete(*args, **kwargs)
+
 class NoteComment(models.Model):
     note = models.ForeignKey(LocationNote, on_delete=models.CASCADE, related_name='comments')
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -131,28 +140,34 @@ class Game(models.Model):
     center = models.PointField(null=True, blank=True)
     kitty_value_per_player = models.DecimalField(max_digits=10, decimal_places=2, default=10)
     total_kitty = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # Derived from the players, kept up to date by refresh_derived_fields()
+    player_count = models.IntegerField(default=0)
+    team_sizes = models.JSONField(default=dict, blank=True)
+    # Zone shrink schedule, see world.shrink
+    started_at = models.DateTimeField(null=True, blank=True)
+    shrink_schedule = models.JSONField(default=list, blank=True)
+    current_stage = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Lobby listing: filtered by status, cursor paginated on created_at
+            models.Index(fields=['status', '-created_at'], name='world_game_status_created'),
+        ]
 
     def assign_teams_and_hunted(self):
         """Randomly assign teams and select a hunted player"""
-        print("Starting team assignment...")  # Debug print
+        logger.debug('Assigning teams for game %s', self.id)
         players = list(self.players.all())
         if len(players) < 3:
             raise ValueError("Need at least 3 players")
 
-        # Reset all players' teams first
-        for player in players:
-            player.team = 1  # Default to Hunters Team 1
-            player.save()
-
         # Randomly select hunted player
         import random
         hunted = random.choice(players)
         hunted.team = 0  # Team 0 for hunted
-        hunted.save()
-        print(f"Selected {hunted.user.username} as hunted")  # Debug print
 
         # Remove hunted from players list and shuffle remaining players
-        remaining_players = [p for p in players if p != hunted]
+        remaining_players = [p for p in players if p is not hunted]
         random.shuffle(remaining_players)
 
         # Calculate number of hunter teams based on remaining players
@@ -162,66 +177,85 @@ class Game(models.Model):
         else:
             num_teams = 3  # 3 teams for 6+ total players
 
-        print(f"Creating {num_teams} hunter teams")  # Debug print
+        logger.debug('Creating %s hunter teams', num_teams)
 
-        # Distribute players across teams
+        # Distribute players across teams, the first `extra_players` teams
+        # get one player more than the rest
         players_per_team = num_players // num_teams
         extra_players = num_players % num_teams
 
         current_index = 0
         for team_num in range(1, num_teams + 1):
-            # Calculate how many players this team should get
-            team_size = players_per_team
-            if extra_players > 0:
-                team_size += 1
-                extra_players -= 1
-
-            # Assign players to this team
-            team_players = remaining_players[current_index:current_index + team_size]
-            for player in team_players:
+            team_size = players_per_team + (1 if team_num <= extra_players else 0)
+            for player in remaining_players[current_index:current_index + team_size]:
                 player.team = team_num
-                player.save()
-                print(f"Assigned {player.user.username} to team {team_num}")  # Debug print
-            
             current_index += team_size
 
-        self.save()
-        print("Team assignment complete")  # Debug print
+        # One UPDATE for every player, and the team sizes are recounted once
+        # on commit rather than per player
+        with transaction.atomic():
+            GamePlayer.objects.bulk_update(players, ['team'])
+            schedule_derived_refresh(self.id)
+        invalidate_game_state(self.id)
+        logger.debug('Team assignment complete for game %s', self.id)
 
     def set_game_area(self, center_lat, center_lng, radius):
-        from django.contrib.gis.geos import Point
-        self.center = Point(center_lng, center_lat)
+        self.center = Point(center_lng, center_lat, srid=4326)
         self.radius = radius
         # Create circular polygon for the area
-        self.current_area = self.center.buffer(radius / 111000)  # Convert meters to degrees
+        self.current_area = circle_polygon(self.center, radius)
         self.area_set = True
-        self.save()
+        self.save(update_fields=['center', 'radius', 'start_area', 'current_area', 'area_set'])
+
+    def start_shrink_schedule(self):
+        """Precompute every zone the game will shrink through, from now"""
+        from .shrink import build_schedule
+
+        self.started_at = timezone.now()
+        self.current_stage = 0
+        self.shrink_schedule = []
+        if self.center and self.radius:
+            self.shrink_schedule = build_schedule(self.center.x, self.center.y, self.radius)
 
     def calculate_total_kitty(self):
-        """Calculate total kitty by multiplying kitty value per player by number of players"""
-        self.total_kitty = self.kitty_value_per_player * self.players.count()
-        self.save()
+        """Recalculate the total kitty from the players and the kitty ledger"""
+        refresh_derived_fields(self.id)
+        self.refresh_from_db(fields=['total_kitty', 'player_count', 'team_sizes'])
 
-    def subtract_from_kitty(self, amount):
+    def subtract_from_kitty(self, amount, user=None):
         """Subtract amount from current total kitty and end game if kitty reaches 0"""
-        if self.total_kitty < amount:
-            raise ValueError("Cannot subtract more than the current kitty value")
-        
-        self.total_kitty -= amount
-        self.save()
+        # A single conditional UPDATE, so concurrent subtractions can neither
+        # overdraw the kitty nor overwrite each other
+        sql = f"""
+            UPDATE {Game._meta.db_table}
+            SET total_kitty = total_kitty - %s,
+                status = CASE WHEN total_kitty - %s <= 0 THEN 'FINISHED' ELSE status END
+            WHERE id = %s AND total_kitty >= %s
+            RETURNING total_kitty, status
+        """
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(sql, [amount, amount, self.id, amount])
+                row = cursor.fetchone()
+            if row is None:
+                raise ValueError("Cannot subtract more than the current kitty value")
+            KittyTransaction.objects.create(
+                game=self, user=user, amount=-amount, reason=KittyTransaction.SUBTRACT
+            )
+
+        was_finished = self.status == 'FINISHED'
+        self.total_kitty, self.status = row
+        invalidate_game_state(self.id)
 
         # Check if kitty is depleted
-        if self.total_kitty <= 0:
-            self.status = 'FINISHED'
-            self.save()
+        if self.status == 'FINISHED' and not was_finished:
             return True  # Return True to indicate game ended
         return False
 
     def add_player(self, user):
-        """Add a player and recalculate kitty"""
+        """Add a player; the kitty is recalculated when the insert commits"""
         if not GamePlayer.objects.filter(game=self, user=user).exists():
             GamePlayer.objects.create(game=self, user=user)
-            self.calculate_total_kitty()  # Recalculate after adding player
 
     def __str__(self):
         return f"Game {self.id} ({self.status})"
@@ -229,7 +263,7 @@ class Game(models.Model):
     def save(self, *args, **kwargs):
         # Ensure start_area is set if we have center and radius
         if self.center and self.radius and not self.start_area:
-            self.start_area = self.center.buffer(self.radius / 111000)
+            self.start_area = circle_polygon(self.center, self.radius)
             self.current_area = self.start_area
             self.area_set = True
         
@@ -239,6 +273,25 @@ class Game(models.Model):
 
         super().save(*args, **kwargs)
 
+class KittyTransaction(models.Model):
+    """Ledger of every change made to a game's kitty"""
+    SUBTRACT = 'SUBTRACT'
+    REASON_CHOICES = [
+        (SUBTRACT, 'Subtracted by the hunted team'),
+    ]
+
+    game = models.ForeignKey(Game, on_delete=models.CASCADE, related_name='kitty_transactions')
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['created_at']
+
+    def __str__(self):
+        return f"{self.amount} on game {self.game_id} ({self.reason})"
+
 class GamePlayer(models.Model):
     TEAM_CHOICES = [
         (0, 'Hunted'),
@@ -253,15 +306,77 @@ class GamePlayer(models.Model):
     location = models.PointField(null=True, blank=True)
     created_at = models.DateTimeField(default=timezone.now)
 
+    # Fields the Game's derived fields (kitty, counts, team sizes) don't depend on
+    NON_DERIVED_FIELDS = {'location'}
+
     class Meta:
         unique_together = ('game', 'user')
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Location only saves change nothing the Game derives from its players
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or not set(update_fields) <= self.NON_DERIVED_FIELDS:
+            schedule_derived_refresh(self.game_id)
+
+    def update_location(self, latitude, longitude, accuracy=None):
+        """Queue a location fix, written with the next batched flush.
+
+        Returns False if the fix was filtered out as jitter.
+        """
+        from .ingest import location_buffer
+
+        accuracy = float(accuracy) if accuracy is not None else None
+        return location_buffer.add_player_fix(
+            self.id, float(latitude), float(longitude), accuracy, game_id=self.game_id
+        )
+
     def get_team_display(self):
         return dict(self.TEAM_CHOICES).get(self.team, 'Unknown Team')
 
     def __str__(self):
         return f"{self.user.username} in {self.game} - {self.get_team_display()}"
 
+class LocationHistory(models.Model):
+    """Append-only log of every accepted location fix of a game's players.
+
+    The table is range partitioned by day on recorded_at (see migration 0011
+    and world.history), so rows are only ever written with COPY from the
+    ingest buffer and read back in time order by the replay endpoint.
+    """
+    game = models.ForeignKey(Game, on_delete=models.CASCADE, related_name='location_history')
+    player = models.ForeignKey(GamePlayer, on_delete=models.CASCADE, related_name='location_history')
+    recorded_at = models.DateTimeField()
+    location = models.PointField()
+    accuracy = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['game', 'recorded_at', 'id'], name='world_lochist_game_time'),
+        ]
+
+    def __str__(self):
+        return f"Player {self.player_id} at {self.recorded_at}"
+
+class PlayerTrack(models.Model):
+    """A player's simplified path through a finished game.
+
+    Written by world.tracks when a game's raw LocationHistory is compacted.
+    GeoDjango has no M coordinates, so each vertex stores its time as the Z
+    value, in seconds since the epoch.
+    """
+    game = models.ForeignKey(Game, on_delete=models.CASCADE, related_name='tracks')
+    player = models.ForeignKey(GamePlayer, on_delete=models.CASCADE, related_name='tracks')
+    path = models.LineStringField(dim=3)
+    raw_points = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('game', 'player')
+
+    def __str__(self):
+        return f"Track of player {self.player_id} in game {self.game_id}"
+
 class GameHint(models.Model):
     game = models.ForeignKey(Game, on_delete=models.CASCADE, related_name='hints')
     content = models.TextField()
@@ -279,12 +394,110 @@ class ChatMessage(models.Model):
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # Chat is paged by id within a game (after_id / before_id cursors)
+            models.Index(fields=['game', 'id'], name='world_chat_game_id'),
+        ]
 
     def __str__(self):
         return f"{self.user.username}: {self.content[:50]}"
 
+_pending_refresh = threading.local()
+
+def refresh_derived_fields(game_id):
+    """Recompute a game's player count, team sizes and total kitty.
+
+    The total kitty is kitty_value_per_player * players plus the sum of the
+    game's KittyTransactions, never below zero.
+    """
+    team_sizes = dict(
+        GamePlayer.objects.filter(game_id=game_id)
+        .values_list('team')
+        .annotate(size=Count('id'))
+        .order_by()
+    )
+    player_count = sum(team_sizes.values())
+    # Kitty is what every player paid in plus the ledger (subtractions are
+    # negative), computed in the UPDATE so it can't race a subtraction
+    ledger = Subquery(
+        KittyTransaction.objects.filter(game_id=OuterRef('id'))
+        .order_by()
+        .values('game_id')
+        .annotate(total=Sum('amount'))
+        .values('total')
+    )
+    Game.objects.filter(id=game_id).update(
+        player_count=player_count,
+        team_sizes={str(team): size for team, size in team_sizes.items()},
+        total_kitty=Greatest(
+            F('kitty_value_per_player') * player_count
+            + Coalesce(ledger, Value(Decimal('0')), output_field=DecimalField()),
+            Value(Decimal('0')),
+            output_field=DecimalField()
+        )
+    )
+    invalidate_game_state(game_id)
+
+def schedule_derived_refresh(game_id):
+    """Run refresh_derived_fields once for game_id when the transaction commits.
+
+    Any number of player changes inside one transaction result in a single
+    recount per game. Outside a transaction it runs immediately.
+    """
+    connection = transaction.get_connection()
+    pending = getattr(_pending_refresh, 'callbacks', None)
+    # No queued on-commit callbacks means the previous transaction committed
+    # or rolled back, so nothing in the dict is still pending
+    if pending is None or not connection.run_on_commit:
+        pending = _pending_refresh.callbacks = {}
+    # A rollback (of the transaction or a savepoint) discards the callback, in
+    # which case the refresh has to be scheduled again
+    queued = pending.get(game_id)
+    if queued is not None and any(entry[1] is queued for entry in connection.run_on_commit):
+        return
+
+    def run():
+        pending.pop(game_id, None)
+        refresh_derived_fields(game_id)
+
+    pending[game_id] = run
+    transaction.on_commit(run)
+
+@receiver([post_save, post_delete], sender=Game)
+def invalidate_cached_game(sender, instance, **kwargs):
+    invalidate_game_state(instance.id)
+
 @receiver([post_save, post_delete], sender=GamePlayer)
-def update_game_kitty(sender, instance, **kwargs):
-    """Update game's total kitty whenever players change"""
-    if hasattr(instance, 'game'):
-        instance.game.calculate_total_kitty()
\ No newline at end of file
+def invalidate_cached_game_players(sender, instance, **kwargs):
+    invalidate_game_state(instance.game_id)
+
+@receiver(post_delete, sender=GamePlayer)
+def refresh_game_after_player_delete(sender, instance, **kwargs):
+    # A receiver rather than GamePlayer.delete, so queryset deletes and
+    # cascades recount the game too
+    schedule_derived_refresh(instance.game_id)
+
+@receiver(post_save, sender=ChatMessage)
+def notify_new_chat_message(sender, instance, created, **kwargs):
+    if created:
+        from .events import notify_chat_message
+        transaction.on_commit(lambda: notify_chat_message(instance.game_id, instance.id))
+
+@receiver(post_delete, sender='authtoken.Token')
+def invalidate_deleted_token(sender, instance, **kwargs):
+    # Deleted in logout, the admin or when rotated, the token caches must not
+    # keep accepting it
+    from .authentication import invalidate_token
+    transaction.on_commit(lambda: invalidate_token(instance.key))
+
+@receiver(post_save, sender=User)
+def invalidate_inactive_user_tokens(sender, instance, created, **kwargs):
+    # Cached token users are only checked for is_active when cached, so drop
+    # the tokens of a deactivated user
+    if created or instance.is_active:
+        return
+    from rest_framework.authtoken.models import Token
+    from .authentication import invalidate_token
+    token_keys = list(Token.objects.filter(user=instance).values_list('key', flat=True))
+    if token_keys:
+        transaction.on_commit(lambda: invalidate_token(*token_keys))
@@ -0,0 +1,10 @@
+from rest_framework.pagination import CursorPagination
+
+
+class GameCursorPagination(CursorPagination):
+    """Newest games first, paged with an opaque cursor rather than an offset"""
+    # id breaks ties between games created in the same instant
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
@@ -0,0 +1,105 @@
+"""
+Capture detection.
+
+Finds every hunter that is within the capture radius of a hunted player. Games
+can be checked in bulk: the ``numpy`` engine loads all positions for the given
+games in one query and computes the distances in a single vectorised pass, the
+``postgis`` engine pushes the whole check into one ``ST_DWithin`` query on
+geography so nothing but the captures leaves the database.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+
+from .geo import haversine_np
+from .models import GamePlayer
+
+HUNTED_TEAM = 0
+
+CaptureEvent = namedtuple(
+    'CaptureEvent', ['game_id', 'hunter_id', 'hunted_id', 'team', 'distance']
+)
+
+
+def find_captures(game_ids, radius_m=None, engine=None):
+    """Return CaptureEvents for the given games, nearest capture first"""
+    game_ids = list(game_ids)
+    if not game_ids:
+        return []
+    if radius_m is None:
+        radius_m = getattr(settings, 'CAPTURE_RADIUS_METERS', 10)
+    engine = engine or getattr(settings, 'PROXIMITY_ENGINE', 'numpy')
+
+    if engine == 'postgis':
+        return find_captures_postgis(game_ids, radius_m)
+    if engine == 'numpy':
+        return find_captures_numpy(game_ids, radius_m)
+    raise ValueError(f'Unknown proximity engine: {engine}')
+
+
+def find_captures_numpy(game_ids, radius_m):
+    rows = list(
+        GamePlayer.objects
+        .filter(game_id__in=game_ids, location__isnull=False)
+        .values_list('game_id', 'user_id', 'team', 'location')
+    )
+    if not rows:
+        return []
+
+    game = np.array([r[0] for r in rows], dtype=np.int64)
+    user = np.array([r[1] for r in rows], dtype=np.int64)
+    team = np.array([r[2] for r in rows], dtype=np.int64)
+    lng = np.array([r[3].x for r in rows], dtype=float)
+    lat = np.array([r[3].y for r in rows], dtype=float)
+
+    hunted_rows = np.flatnonzero(team == HUNTED_TEAM)
+    hunter_rows = np.flatnonzero(team != HUNTED_TEAM)
+    if not len(hunted_rows) or not len(hunter_rows):
+        return []
+
+    # Pair every hunter with every hunted player of the same game. There is
+    # normally one hunted player per game, so this is one pair per hunter.
+    order = np.argsort(game[hunted_rows], kind='stable')
+    hunted_rows = hunted_rows[order]
+    hunted_games = game[hunted_rows]
+    lo = np.searchsorted(hunted_games, game[hunter_rows], side='left')
+    hi = np.searchsorted(hunted_games, game[hunter_rows], side='right')
+    counts = hi - lo
+    if not counts.any():
+        return []
+    hunter_idx = np.repeat(hunter_rows, counts)
+    within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    hunted_idx = hunted_rows[np.repeat(lo, counts) + within]
+
+    distance = haversine_np(lng[hunter_idx], lat[hunter_idx], lng[hunted_idx], lat[hunted_idx])
+    hits = np.flatnonzero(distance <= radius_m)
+    hits = hits[np.argsort(distance[hits], kind='stable')]
+
+    return [
+        CaptureEvent(
+            int(game[hunter_idx[i]]), int(user[hunter_idx[i]]),
+            int(user[hunted_idx[i]]), int(team[hunter_idx[i]]), float(distance[i])
+        )
+        for i in hits
+    ]
+
+
+def find_captures_postgis(game_ids, radius_m):
+    table = GamePlayer._meta.db_table
+    sql = f"""
+        SELECT hunter.game_id, hunter.user_id, hunted.user_id, hunter.team,
+               ST_Distance(hunter.location::geography, hunted.location::geography) AS distance
+        FROM {table} hunted
+        JOIN {table} hunter
+          ON hunter.game_id = hunted.game_id AND hunter.team <> %s
+        WHERE hunted.team = %s
+          AND hunted.game_id = ANY(%s)
+          AND ST_DWithin(hunter.location::geography, hunted.location::geography, %s)
+        ORDER BY distance
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [HUNTED_TEAM, HUNTED_TEAM, game_ids, radius_m])
+        return [CaptureEvent(*row) for row in cursor.fetchall()]
@@ -0,0 +1,26 @@
+"""JSON rendering with orjson, selected with the FAST_JSON_RENDERER setting"""
+
+import orjson
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+OPTIONS = orjson.OPT_NON_STR_KEYS
+
+_fallback = JSONEncoder()
+
+
+def dumps(data):
+    # orjson handles the common types itself and falls back to DRF's encoder
+    # for the rest (Decimal, lazy strings, querysets, ...)
+    return orjson.dumps(data, default=_fallback.default, option=OPTIONS)
+
+
+class ORJSONRenderer(BaseRenderer):
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return dumps(data)
@@ -1,6 +1,13 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from .models import Game, GamePlayer, GameHint, ChatMessage
+from .areas import area_representation
+
+def center_geojson(point):
+    """GeoJSON Point for a game centre, None if it has none"""
+    if not point:
+        return None
+    return {'type': 'Point', 'coordinates': [point.x, point.y]}
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -36,22 +43,61 @@ class GameSerializer(serializers.ModelSerializer):
     center = serializers.SerializerMethodField()
     total_kitty = serializers.DecimalField(max_digits=8, decimal_places=2, read_only=True)
     kitty_value_per_player = serializers.DecimalField(max_digits=6, decimal_places=2)
+    player_count = serializers.IntegerField(read_only=True)
+    current_area = serializers.SerializerMethodField()
     
     class Meta:
         model = Game
         fields = [
             'id', 'status', 'host', 'players', 'current_area', 
             'radius', 'kitty_value_per_player', 'total_kitty', 'center',
-            'area_set'
+            'area_set', 'player_count', 'team_sizes', 'started_at',
+            'shrink_schedule', 'current_stage'
         ]
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Load everything the serializer touches in a fixed number of queries"""
+        return (
+            queryset
+            .select_related('host')
+            .prefetch_related('players__user')
+        )
+
+    def get_current_area(self, obj):
+        # Clients can ask for the compact {center, radius} form with ?area=circle
+        request = self.context.get('request')
+        area_format = self.context.get('area_format')
+        if area_format is None and request is not None:
+            area_format = request.query_params.get('area')
+        return area_representation(obj, area_format)
+
     def get_center(self, obj):
-        if obj.center:
-            return {
-                'type': 'Point',
-                'coordinates': [obj.center.x, obj.center.y]
-            }
-        return None
+        return center_geojson(obj.center)
+
+class GameListSerializer(serializers.ModelSerializer):
+    """Lobby representation of a game, without players or the area polygon"""
+    host = UserSerializer(read_only=True)
+    center = serializers.SerializerMethodField()
+    player_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Game
+        fields = [
+            'id', 'status', 'host', 'player_count', 'radius',
+            'kitty_value_per_player', 'total_kitty', 'center', 'area_set',
+            'created_at'
+        ]
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return (
+            queryset
+            .select_related('host')
+        )
+
+    def get_center(self, obj):
+        return center_geojson(obj.center)
 
 class ChatMessageSerializer(serializers.ModelSerializer):
     username = serializers.CharField(source='user.username', read_only=True)
@@ -0,0 +1,56 @@
+"""
+Precomputed shrink schedule for the game zone.
+
+When a game starts the whole sequence of zones is generated up front and
+stored on the game as ``[seconds_from_start, lng, lat, radius_m]`` stages.
+Stage 0 is the starting circle. Each later stage is a smaller circle that lies
+entirely inside the previous one; during the last AREA_SHRINK_TRANSITION
+seconds before a stage's time the zone shrinks linearly from the previous
+stage to it. Clients get the schedule once with the game and animate the zone
+themselves, the server only announces when a stage is reached.
+"""
+
+import math
+import random
+
+from django.conf import settings
+
+from .geo import destination
+
+
+def build_schedule(center_lng, center_lat, radius_m, interval=None, factor=None,
+                   min_radius=None, rng=random):
+    interval = interval or settings.AREA_REDUCTION_INTERVAL
+    factor = factor or settings.AREA_SHRINK_FACTOR
+    min_radius = min_radius or settings.AREA_MIN_RADIUS
+
+    stages = [[0, center_lng, center_lat, radius_m]]
+    lng, lat, radius = center_lng, center_lat, radius_m
+    while radius > min_radius:
+        new_radius = max(min_radius, radius * factor)
+        # Any centre within (radius - new_radius) keeps the new circle inside the old
+        offset = (radius - new_radius) * math.sqrt(rng.random())
+        lng, lat = destination(lng, lat, rng.uniform(0, 2 * math.pi), offset)
+        radius = new_radius
+        stages.append([len(stages) * interval, round(lng, 7), round(lat, 7), round(radius, 2)])
+    return stages
+
+
+def zone_at(schedule, elapsed, transition=None):
+    """(lng, lat, radius) of the zone `elapsed` seconds after the game started"""
+    transition = settings.AREA_SHRINK_TRANSITION if transition is None else transition
+    current = schedule[0]
+    for stage in schedule[1:]:
+        start = stage[0] - transition
+        if elapsed >= stage[0]:
+            current = stage
+            continue
+        if elapsed > start and transition > 0:
+            f = (elapsed - start) / transition
+            return (
+                current[1] + (stage[1] - current[1]) * f,
+                current[2] + (stage[2] - current[2]) * f,
+                current[3] + (stage[3] - current[3]) * f,
+            )
+        break
+    return current[1], current[2], current[3]
@@ -1,86 +1,80 @@
-from datetime import timedelta
-from django.utils import timezone
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from django.contrib.gis.geos import Point
 from .models import Game
-from django.contrib.gis.geos import Polygon
+from .events import send_game_event
+from .proximity import find_captures
+from .areas import circle_polygon
+from .cache import invalidate_game_state
 
-channel_layer = get_channel_layer()
+def next_stage_time(game):
+    """Epoch seconds at which the game reaches its next zone stage, or None"""
+    next_stage = game.current_stage + 1
+    if not game.started_at or next_stage >= len(game.shrink_schedule):
+        return None
+    return game.started_at.timestamp() + game.shrink_schedule[next_stage][0]
+
+def next_stage_times(game_ids):
+    """next_stage_time for many games with one query"""
+    games = Game.objects.filter(id__in=game_ids).only('id', 'started_at', 'current_stage', 'shrink_schedule')
+    return {game.id: next_stage_time(game) for game in games}
 
 def reduce_game_area(game_id):
-    """Reduce the game area by 20%"""
+    """Move the game to the next stage of its precomputed shrink schedule.
+
+    Returns when the stage after that is due (epoch seconds), or None.
+    """
     try:
         game = Game.objects.get(id=game_id)
-        if game.status != 'IN_PROGRESS':
-            return
-        
-        # Get the current area bounds
-        bounds = game.current_area.extent
-        center_x = (bounds[0] + bounds[2]) / 2
-        center_y = (bounds[1] + bounds[3]) / 2
-        
-        # Calculate new bounds (20% smaller)
-        width = (bounds[2] - bounds[0]) * 0.8
-        height = (bounds[3] - bounds[1]) * 0.8
-        
-        new_bounds = (
-            center_x - width/2,
-            center_y - height/2,
-            center_x + width/2,
-            center_y + height/2
-        )
-        
-        # Create new polygon
-        new_area = Polygon.from_bbox(new_bounds)
-        game.current_area = new_area
-        game.next_area_reduction = timezone.now() + timedelta(minutes=25)
-        game.save()
-        
-        # Notify clients
-        async_to_sync(channel_layer.group_send)(
-            f'game_{game_id}',
-            {
-                'type': 'game_update',
-                'data': {
-                    'type': 'area_update',
-                    'area': game.current_area.json
-                }
-            }
-        )
-        
+        if game.status != 'ACTIVE' or next_stage_time(game) is None:
+            return None
+
+        stage = game.current_stage + 1
+        _, lng, lat, radius = game.shrink_schedule[stage]
+        game.current_stage = stage
+        game.center = Point(lng, lat, srid=4326)
+        game.radius = radius
+        game.current_area = circle_polygon(game.center, radius)
+        game.save(update_fields=['current_stage', 'center', 'radius', 'current_area'])
+
+        # Clients already have the schedule and animate the zone themselves,
+        # so only announce which stage has been reached
+        send_game_event(game_id, {
+            'type': 'area_stage',
+            'stage': stage
+        })
+        return next_stage_time(game)
+
     except Game.DoesNotExist:
-        pass
+        return None
 
 def check_game_status(game_id):
-    """Check if any team has found the selected player"""
-    try:
-        game = Game.objects.get(id=game_id)
-        if game.status != 'IN_PROGRESS':
-            return
-            
-        selected_player = game.players.get(user=game.selected_player)
-        other_players = game.players.exclude(user=game.selected_player)
-        
-        for player in other_players:
-            if player.location and selected_player.location:
-                # Check if players are within 10 meters of each other
-                if player.location.distance(selected_player.location) * 100000 <= 10:
-                    game.status = 'FINISHED'
-                    game.finished_at = timezone.now()
-                    game.save()
-                    
-                    # Notify clients
-                    async_to_sync(channel_layer.group_send)(
-                        f'game_{game_id}',
-                        {
-                            'type': 'game_update',
-                            'data': {
-                                'type': 'game_finished',
-                                'winner_team': player.team
-                            }
-                        }
-                    )
-                    break
-                    
-    except Game.DoesNotExist:
-        pass 
\ No newline at end of file
+    """Check if any team has found the hunted player"""
+    return check_games([game_id])
+
+def check_games(game_ids):
+    """Run the capture check for many active games with a single query.
+
+    Returns the ids of the games that finished.
+    """
+    finished = []
+    seen = set()
+    for capture in find_captures(game_ids):
+        # Captures come back nearest first, so the closest hunter wins
+        if capture.game_id in seen:
+            continue
+        seen.add(capture.game_id)
+
+        # Conditional update so a game is only ever finished once
+        updated = Game.objects.filter(id=capture.game_id, status='ACTIVE').update(status='FINISHED')
+        if not updated:
+            continue
+        finished.append(capture.game_id)
+
+        # Notify clients
+        send_game_event(capture.game_id, {
+            'type': 'game_finished',
+            'winner_team': capture.team
+        })
+
+    if finished:
+        invalidate_game_state(*finished)
+    return finished
@@ -0,0 +1,181 @@
+from types import SimpleNamespace
+
+from django.contrib.auth.models import User
+from django.contrib.gis.geos import Point, Polygon
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from .areas import point_in_area
+from .authentication import get_token_user, local_tokens
+from .models import Game, GamePlayer
+
+# Keep the tests independent of Redis
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class GameListQueryCountTests(APITestCase):
+    """GET /api/games/ must cost the same number of queries for any number of games"""
+
+    PLAYERS_PER_GAME = 4
+
+    def setUp(self):
+        self.viewer = User.objects.create_user('viewer', password='password')
+        self.players = [
+            User.objects.create_user(f'player{i}', password='password')
+            for i in range(self.PLAYERS_PER_GAME)
+        ]
+        self.client.force_login(self.viewer)
+
+    def create_games(self, count):
+        for _ in range(count):
+            game = Game.objects.create(
+                host=self.players[0],
+                center=Point(-6.26, 53.35, srid=4326),
+                radius=500,
+            )
+            for team, user in enumerate(self.players):
+                GamePlayer.objects.create(game=game, user=user, team=team % 3 + 1)
+
+    def list_games(self):
+        """(queries run, games returned) for one lobby request"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/games/', {'page_size': 100})
+        self.assertEqual(response.status_code, 200)
+        return len(queries), len(response.data['results'])
+
+    def assert_constant_queries(self):
+        self.create_games(5)
+        few_queries, shown = self.list_games()
+        self.assertEqual(shown, 5)
+
+        self.create_games(5)
+        many_queries, shown = self.list_games()
+        self.assertEqual(shown, 10)
+
+        self.assertEqual(few_queries, many_queries)
+
+    def test_game_list_query_count_is_constant(self):
+        self.assert_constant_queries()
+
+    @override_settings(FAST_SERIALIZERS=True)
+    def test_fast_game_list_query_count_is_constant(self):
+        self.assert_constant_queries()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AsyncViewTests(APITestCase):
+    """The async read endpoints answer through the full request stack"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('player', password='password')
+        self.game = Game.objects.create(host=self.user, center=Point(-6.26, 53.35, srid=4326))
+        GamePlayer.objects.create(game=self.game, user=self.user, team=1)
+        self.client.force_login(self.user)
+
+    def test_current_user(self):
+        response = self.client.get('/api/current-user/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['username'], 'player')
+
+    def test_game_detail(self):
+        response = self.client.get(f'/api/games/{self.game.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['id'], self.game.id)
+
+    def test_chat_history(self):
+        response = self.client.get(f'/api/games/{self.game.id}/chat/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [])
+
+    def test_game_messages(self):
+        response = self.client.get(f'/api/games/{self.game.id}/messages/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [])
+
+    def test_anonymous_is_rejected(self):
+        self.client.logout()
+        response = self.client.get(f'/api/games/{self.game.id}/')
+        self.assertEqual(response.status_code, 401)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class DerivedFieldsTests(TransactionTestCase):
+    """Player count and kitty are recounted when player changes commit"""
+
+    def setUp(self):
+        self.host = User.objects.create_user('host', password='password')
+        self.other = User.objects.create_user('other', password='password')
+        self.game = Game.objects.create(host=self.host, center=Point(-6.26, 53.35, srid=4326))
+
+    def assert_players(self, count):
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.player_count, count)
+        self.assertEqual(self.game.total_kitty, self.game.kitty_value_per_player * count)
+
+    def test_refresh_after_rolled_back_transaction(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                GamePlayer.objects.create(game=self.game, user=self.host)
+                raise RuntimeError
+        self.assert_players(0)
+
+        with transaction.atomic():
+            GamePlayer.objects.create(game=self.game, user=self.other)
+        self.assert_players(1)
+
+    def test_refresh_after_queryset_delete(self):
+        GamePlayer.objects.create(game=self.game, user=self.host)
+        GamePlayer.objects.create(game=self.game, user=self.other)
+        self.assert_players(2)
+
+        GamePlayer.objects.filter(game=self.game).delete()
+        self.assert_players(0)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TokenCacheTests(TestCase):
+    """Cached token lookups are dropped when the token or its user changes"""
+
+    def setUp(self):
+        local_tokens.clear()
+        self.user = User.objects.create_user('player', password='password')
+        self.token = Token.objects.create(user=self.user)
+        self.assertEqual(get_token_user(self.token.key), self.user)
+
+    def test_deleted_token_is_rejected(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+        self.assertIsNone(get_token_user(self.token.key))
+
+    def test_deactivated_user_is_rejected(self):
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertFalse(get_token_user(self.token.key).is_active)
+
+
+class PointInAreaTests(SimpleTestCase):
+    """Circular areas are tested by haversine distance, others by polygon"""
+
+    def area(self, center=None, radius=None, current_area=None):
+        return SimpleNamespace(center=center, radius=radius, current_area=current_area)
+
+    def test_circle(self):
+        # 0.001 degrees of latitude is about 111 m
+        game = self.area(center=Point(-6.26, 53.35, srid=4326), radius=100)
+        self.assertTrue(point_in_area(game, -6.26, 53.3505))
+        self.assertFalse(point_in_area(game, -6.26, 53.351))
+
+    def test_polygon_fallback(self):
+        square = Polygon.from_bbox((-6.27, 53.34, -6.25, 53.36))
+        square.srid = 4326
+        game = self.area(current_area=square)
+        self.assertTrue(point_in_area(game, -6.26, 53.35))
+        self.assertFalse(point_in_area(game, -6.28, 53.35))
+
+    def test_no_area(self):
+        self.assertTrue(point_in_area(self.area(), 0, 0))
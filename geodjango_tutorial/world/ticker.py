@@ -0,0 +1,137 @@
+"""
+Game tick scheduler.
+
+Keeps a single priority queue of (due time, game, action) across every active
+game and runs each action exactly when it is due. Zone shrinks follow each
+game's precomputed shrink schedule, and every few seconds the players outside
+their zone are found across all games at once. Capture checks that fall due
+together are batched into one proximity query, and the set of active games is
+refreshed with one query every few seconds, so the database load does not grow
+with one query per game per tick.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from .models import Game
+from .zone import ZoneMonitor
+from . import tasks
+
+logger = logging.getLogger(__name__)
+
+CAPTURE = 'capture'
+SHRINK = 'shrink'
+
+
+class GameTicker:
+    def __init__(self, capture_interval=None, refresh_interval=None, zone_interval=None):
+        self.capture_interval = capture_interval or settings.GAME_TICK_CAPTURE_INTERVAL
+        self.zone_interval = zone_interval or settings.GAME_TICK_ZONE_INTERVAL
+        self.zone_monitor = ZoneMonitor()
+        self._next_zone_check = 0
+        self.refresh_interval = refresh_interval or settings.GAME_TICK_REFRESH_INTERVAL
+        self.queue = []
+        self.active = set()
+        self._counter = itertools.count()
+        self._next_refresh = 0
+
+    def reset(self):
+        """Forget all state; every active game is rescheduled on the next refresh"""
+        self.queue = []
+        self.active = set()
+        self._next_refresh = 0
+        self._next_zone_check = 0
+
+    def schedule(self, due, game_id, action):
+        heapq.heappush(self.queue, (due, next(self._counter), game_id, action))
+
+    def add_game(self, game_id, now, next_shrink=None):
+        self.active.add(game_id)
+        self.schedule(now, game_id, CAPTURE)
+        if next_shrink is not None:
+            self.schedule(next_shrink, game_id, SHRINK)
+
+    def sync_active_games(self, active_ids, next_shrinks, now):
+        """Start scheduling newly active games; stale entries are dropped lazily"""
+        active_ids = set(active_ids)
+        for game_id in active_ids - self.active:
+            self.add_game(game_id, now, next_shrinks.get(game_id))
+        self.active = active_ids
+
+    def pop_due(self, now):
+        """Pop every entry that is due, grouped by action"""
+        due = {CAPTURE: [], SHRINK: []}
+        while self.queue and self.queue[0][0] <= now:
+            when, _, game_id, action = heapq.heappop(self.queue)
+            if game_id not in self.active:
+                continue
+            due[action].append((when, game_id))
+        return due
+
+    def next_wakeup(self, now):
+        wakeup = min(self._next_refresh, self._next_zone_check)
+        if self.queue:
+            wakeup = min(wakeup, self.queue[0][0])
+        return max(0, wakeup - now)
+
+    # Database work, run off the event loop
+
+    def load_active_games(self):
+        """Active game ids, plus the next shrink time of games new to the ticker"""
+        active_ids = list(Game.objects.filter(status='ACTIVE').values_list('id', flat=True))
+        new_ids = set(active_ids) - self.active
+        return active_ids, tasks.next_stage_times(new_ids) if new_ids else {}
+
+    def run_captures(self, game_ids):
+        return tasks.check_games(game_ids)
+
+    def run_zone_check(self):
+        # Two queries across every active game, not one per game
+        return self.zone_monitor.check()
+
+    def run_shrink(self, game_id):
+        return tasks.reduce_game_area(game_id)
+
+    async def tick(self):
+        now = time.time()
+
+        if now >= self._next_refresh:
+            active_ids, next_shrinks = await sync_to_async(self.load_active_games)()
+            self.sync_active_games(active_ids, next_shrinks, now)
+            self._next_refresh = now + self.refresh_interval
+
+        due = self.pop_due(now)
+
+        if due[CAPTURE]:
+            game_ids = [game_id for _, game_id in due[CAPTURE]]
+            finished = set(await sync_to_async(self.run_captures)(game_ids))
+            self.active -= finished
+            for when, game_id in due[CAPTURE]:
+                if game_id in self.active:
+                    self.schedule(max(now, when + self.capture_interval), game_id, CAPTURE)
+
+        for when, game_id in due[SHRINK]:
+            next_shrink = await sync_to_async(self.run_shrink)(game_id)
+            if next_shrink is not None:
+                self.schedule(next_shrink, game_id, SHRINK)
+
+        if now >= self._next_zone_check:
+            await sync_to_async(self.run_zone_check)()
+            self._next_zone_check = now + self.zone_interval
+
+    async def run(self):
+        while True:
+            try:
+                await self.tick()
+            except Exception:
+                logger.exception('Game tick failed')
+                await sync_to_async(close_old_connections)()
+                self.reset()
+            await asyncio.sleep(self.next_wakeup(time.time()))
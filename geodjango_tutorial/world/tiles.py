@@ -0,0 +1,123 @@
+"""
+Mapbox vector tiles (MVT) rendered by PostGIS.
+
+Each layer is a single ``ST_AsMVT`` query over the tile envelope. Rendered
+tiles up to TILE_CACHE_MAX_ZOOM are cached on disk under TILE_CACHE_DIR, and
+note tiles are removed when a note under them changes. The ``games`` layer is
+never cached: zones are changed by the game ticker, which runs in its own
+container and can't reach the web container's cache.
+"""
+
+import math
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.db import connection
+from django.http import Http404, HttpResponse
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+
+from .models import WorldBorder, Game, LocationNote
+
+MAX_ZOOM = 22
+MAX_INVALIDATE_TILES = 256
+
+# Layers always rendered fresh, see the module docstring
+UNCACHED_LAYERS = {'games'}
+
+# layer name -> (table, geometry column, attribute columns, extra WHERE clause)
+LAYERS = {
+    'world_borders': (WorldBorder._meta.db_table, 'mpoly', ['id', 'name', 'iso3'], ''),
+    'games': (Game._meta.db_table, 'current_area', ['id', 'status', 'radius'], "AND t.status = 'ACTIVE'"),
+    'notes': (LocationNote._meta.db_table, 'location', ['id', 'title'], ''),
+}
+
+
+def render_tile(layer, z, x, y):
+    table, geom_column, columns, where = LAYERS[layer]
+    attributes = ', '.join(f't.{column}' for column in columns)
+    sql = f"""
+        WITH bounds AS (
+            SELECT ST_TileEnvelope(%s, %s, %s) AS geom
+        ),
+        mvtgeom AS (
+            SELECT ST_AsMVTGeom(ST_Transform(t.{geom_column}, 3857), bounds.geom) AS geom, {attributes}
+            FROM {table} t, bounds
+            WHERE t.{geom_column} && ST_Transform(bounds.geom, 4326) {where}
+        )
+        SELECT ST_AsMVT(mvtgeom.*, %s) FROM mvtgeom
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [z, x, y, layer])
+        return bytes(cursor.fetchone()[0] or b'')
+
+
+def tile_path(layer, z, x, y):
+    return os.path.join(settings.TILE_CACHE_DIR, layer, str(z), str(x), f'{y}.mvt')
+
+
+def get_tile(layer, z, x, y):
+    """Return the tile bytes, from the disk cache when possible"""
+    if z > settings.TILE_CACHE_MAX_ZOOM or layer in UNCACHED_LAYERS:
+        return render_tile(layer, z, x, y)
+
+    path = tile_path(layer, z, x, y)
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        pass
+
+    tile = render_tile(layer, z, x, y)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write then rename so readers never see a half written tile
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, 'wb') as f:
+        f.write(tile)
+    os.replace(tmp_path, path)
+    return tile
+
+
+def lnglat_to_tile(lng, lat, z):
+    n = 2 ** z
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = int((lng + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def invalidate_extent(layer, extent):
+    """Drop every cached tile of layer that overlaps extent (xmin, ymin, xmax, ymax)"""
+    xmin, ymin, xmax, ymax = extent
+    for z in range(settings.TILE_CACHE_MAX_ZOOM + 1):
+        x0, y0 = lnglat_to_tile(xmin, ymax, z)
+        x1, y1 = lnglat_to_tile(xmax, ymin, z)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > MAX_INVALIDATE_TILES:
+            # Large areas: cheaper to drop the whole zoom level than stat each tile
+            shutil.rmtree(os.path.join(settings.TILE_CACHE_DIR, layer, str(z)), ignore_errors=True)
+            continue
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                try:
+                    os.remove(tile_path(layer, z, x, y))
+                except FileNotFoundError:
+                    pass
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def vector_tile(request, layer, z, x, y):
+    """Tiles show every active game's zone and every note, so like the rest of
+    the game API they need an authenticated user (token or session)"""
+    if layer not in LAYERS or z > MAX_ZOOM or x >= 2 ** z or y >= 2 ** z:
+        raise Http404('No such tile')
+
+    tile = get_tile(layer, z, x, y)
+    if not tile:
+        return HttpResponse(status=204)
+
+    response = HttpResponse(tile, content_type='application/vnd.mapbox-vector-tile')
+    response['Cache-Control'] = f'private, max-age={settings.TILE_MAX_AGE[layer]}'
+    return response
@@ -0,0 +1,144 @@
+"""
+Track compaction.
+
+Raw location history is kept while a game is played, then each player's fixes
+are simplified into one PlayerTrack and the raw rows are dropped. The
+simplification is Douglas-Peucker using the synchronized euclidean distance:
+a fix is dropped only if it lies within the tolerance of where the player would
+be at that moment moving at constant speed along the simplified path, so the
+timing of the track survives as well as its shape.
+"""
+
+import datetime
+import heapq
+import itertools
+import math
+
+import numpy as np
+from django.conf import settings
+from django.contrib.gis.geos import LineString
+from django.db import transaction
+
+from .geo import EARTH_RADIUS_M
+from .models import Game, LocationHistory, PlayerTrack
+
+
+def simplify_track(lng, lat, t, tolerance_m):
+    """Indices of the fixes to keep, lng/lat in degrees and t in seconds"""
+    lng, lat, t = (np.asarray(v, dtype=float) for v in (lng, lat, t))
+    n = len(t)
+    if n <= 2:
+        return np.arange(n)
+
+    # Local equirectangular projection in metres, plenty for a game area
+    x = np.radians(lng - lng[0]) * EARTH_RADIUS_M * math.cos(math.radians(lat[0]))
+    y = np.radians(lat - lat[0]) * EARTH_RADIUS_M
+
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        i, j = stack.pop()
+        if j - i < 2:
+            continue
+        k = np.arange(i + 1, j)
+        span = t[j] - t[i]
+        frac = (t[k] - t[i]) / span if span > 0 else np.zeros(len(k))
+        distance = np.hypot(
+            x[k] - (x[i] + frac * (x[j] - x[i])),
+            y[k] - (y[i] + frac * (y[j] - y[i]))
+        )
+        m = int(np.argmax(distance))
+        if distance[m] > tolerance_m:
+            split = int(k[m])
+            keep[split] = True
+            stack.append((i, split))
+            stack.append((split, j))
+    return np.flatnonzero(keep)
+
+
+def compact_player(game_id, player_id, track=None, tolerance_m=None):
+    """Fold a player's raw fixes (and any earlier track) into one PlayerTrack"""
+    if tolerance_m is None:
+        tolerance_m = settings.TRACK_SIMPLIFY_TOLERANCE
+
+    rows = list(
+        LocationHistory.objects
+        .filter(game_id=game_id, player_id=player_id)
+        .order_by('recorded_at', 'id')
+        .values_list('recorded_at', 'location')
+    )
+    coords = [(p.x, p.y, recorded_at.timestamp()) for recorded_at, p in rows]
+    raw_points = len(rows)
+    if track is not None:
+        coords = list(track.path.coords) + coords
+        raw_points += track.raw_points
+    if not coords:
+        return None
+
+    coords.sort(key=lambda c: c[2])
+    lng, lat, t = zip(*coords)
+    kept = [coords[i] for i in simplify_track(lng, lat, t, tolerance_m)]
+    if len(kept) == 1:
+        # A LineString needs two vertices
+        kept.append(kept[0])
+
+    path = LineString(kept, srid=4326)
+    if track is None:
+        return PlayerTrack.objects.create(
+            game_id=game_id, player_id=player_id, path=path, raw_points=raw_points
+        )
+    track.path = path
+    track.raw_points = raw_points
+    track.save(update_fields=['path', 'raw_points'])
+    return track
+
+
+def compact_game(game_id, tolerance_m=None):
+    """Compact every player's history of a game, returns (tracks, raw rows dropped)"""
+    with transaction.atomic():
+        tracks = {
+            track.player_id: track
+            for track in PlayerTrack.objects.select_for_update().filter(game_id=game_id)
+        }
+        player_ids = set(
+            LocationHistory.objects.filter(game_id=game_id)
+            .values_list('player_id', flat=True).distinct()
+        )
+        for player_id in player_ids:
+            compact_player(game_id, player_id, tracks.get(player_id), tolerance_m)
+        dropped, _ = LocationHistory.objects.filter(game_id=game_id).delete()
+    return len(player_ids), dropped
+
+
+def games_to_compact():
+    """Finished games that still have raw history"""
+    return list(
+        Game.objects.filter(status='FINISHED', location_history__isnull=False)
+        .values_list('id', flat=True).distinct()
+    )
+
+
+def track_chunks(game_id, since=None, until=None, chunk_size=2000):
+    """Yield a compacted game as replay rows in time order, like history_chunks"""
+    tracks = PlayerTrack.objects.filter(game_id=game_id).values_list(
+        'player_id', 'player__user_id', 'path'
+    )
+    since = since.timestamp() if since is not None else None
+    until = until.timestamp() if until is not None else None
+
+    def fixes(player_id, user_id, path):
+        for lng, lat, ts in path.coords:
+            if since is not None and ts < since:
+                continue
+            if until is not None and ts >= until:
+                return
+            recorded_at = datetime.datetime.fromtimestamp(ts, datetime.timezone.utc)
+            yield recorded_at, player_id, user_id, lng, lat, None
+
+    merged = heapq.merge(*(fixes(*track) for track in tracks), key=lambda row: row[0])
+    while True:
+        chunk = list(itertools.islice(merged, chunk_size))
+        if not chunk:
+            return
+        yield chunk
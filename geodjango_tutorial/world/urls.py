@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import views, async_views, tiles, metrics
 
 app_name = 'world'
 
@@ -7,9 +7,9 @@ urlpatterns = [
     path('login/', views.login_view, name='login'),
     path('register/', views.register_view, name='register'),
     path('games/', views.GameListCreate.as_view(), name='games'),
-    path('current-user/', views.current_user, name='current-user'),
+    path('current-user/', async_views.current_user, name='current-user'),
     path('logout/', views.logout_view, name='logout'),
-    path('games/<int:pk>/', views.GameDetail.as_view(), name='game-detail'),
+    path('games/<int:pk>/', async_views.game_detail, name='game-detail'),
     path('games/<int:pk>/join/', views.JoinGame.as_view(), name='join-game'),
     path('games/<int:pk>/start/', views.StartGame.as_view(), name='start-game'),
     path('games/<int:game_id>/join/', views.join_game, name='join-game'),
@@ -17,7 +17,11 @@ urlpatterns = [
     path('games/<int:game_id>/update-area/', views.update_game_area, name='update-game-area'),
     path('api/games/<int:game_id>/set_area/', views.set_game_area, name='set_game_area'),
     path('api/register/', views.register_view, name='register'),
-    path('games/<int:game_id>/chat/', views.chat_history, name='chat-history'),
-    path('games/<int:game_id>/messages/', views.game_messages, name='game_messages'),
+    path('games/<int:game_id>/chat/', async_views.chat_history, name='chat-history'),
+    path('games/<int:game_id>/messages/', async_views.game_messages, name='game_messages'),
+    path('games/<int:game_id>/replay/', views.game_replay, name='game-replay'),
+    path('notes/', views.get_notes, name='get_notes'),
+    path('tiles/<str:layer>/<int:z>/<int:x>/<int:y>.mvt', tiles.vector_tile, name='vector-tile'),
     path('games/<int:game_id>/subtract-kitty/', views.subtract_from_kitty, name='subtract-kitty'),
+    path('metrics/', metrics.metrics_view, name='metrics'),
 ] 
\ No newline at end of file
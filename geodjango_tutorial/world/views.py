@@ -2,14 +2,21 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework import generics, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from .models import Game, GamePlayer, GameHint, ChatMessage
-from .serializers import GameSerializer, GameHintSerializer, ChatMessageSerializer
+from .models import Game, GamePlayer, GameHint, ChatMessage, LocationNote, NoteComment
+from .serializers import GameSerializer, GameListSerializer, GameHintSerializer, ChatMessageSerializer
+from .pagination import GameCursorPagination
+from . import fast_serializers
+from .geo import bbox_around
+from .areas import area_representation, circle_polygon
+from .cache import get_game_state
+from .history import areplay_lines
 from django.contrib.gis.geos import Polygon, Point
+from django.contrib.gis.measure import D
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.views.generic import ListView, DetailView
 from rest_framework import viewsets
@@ -19,19 +26,65 @@ from rest_framework.decorators import api_view, permission_classes
 from django.contrib.auth.models import User
 from django.middleware.csrf import get_token
 from rest_framework.authtoken.models import Token
+import logging
 import random
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
-from rest_framework.authentication import TokenAuthentication
+import time
+from django.conf import settings
+from django.db import connection
+from django.db.models import Prefetch
+from .events import send_game_event
+from .authentication import CachedTokenAuthentication
 from rest_framework.exceptions import ValidationError
 from decimal import Decimal
+from django.utils.dateparse import parse_datetime
+
+logger = logging.getLogger(__name__)
 
 def index(request):
     """Main map view"""
     return render(request, 'world/index.html')
 
+def parse_bbox(value):
+    """Parse a ``minLng,minLat,maxLng,maxLat`` string, returns None if invalid"""
+    try:
+        xmin, ymin, xmax, ymax = (float(v) for v in value.split(','))
+    except (AttributeError, TypeError, ValueError):
+        return None
+    if xmin > xmax or ymin > ymax:
+        return None
+    return (xmin, ymin, xmax, ymax)
+
 def get_notes(request):
-    notes = LocationNote.objects.all().select_related('user')
+    """Notes inside the map viewport.
+
+    Takes ``?bbox=minLng,minLat,maxLng,maxLat&zoom=<z>``. Below
+    NOTE_CLUSTER_MAX_ZOOM the notes are summarised server side into grid
+    clusters instead of being returned one by one.
+    """
+    bbox = parse_bbox(request.GET.get('bbox'))
+    if bbox is None:
+        return JsonResponse({
+            'success': False,
+            'message': 'bbox=minLng,minLat,maxLng,maxLat is required'
+        }, status=400)
+    try:
+        zoom = int(request.GET.get('zoom', settings.NOTE_CLUSTER_MAX_ZOOM))
+    except ValueError:
+        zoom = settings.NOTE_CLUSTER_MAX_ZOOM
+
+    if zoom < settings.NOTE_CLUSTER_MAX_ZOOM:
+        return JsonResponse({'notes': [], 'clusters': get_note_clusters(bbox, zoom)})
+
+    notes = (
+        LocationNote.objects
+        .filter(location__bboverlaps=Polygon.from_bbox(bbox))
+        .select_related('user')
+        .prefetch_related(Prefetch(
+            'comments',
+            queryset=NoteComment.objects.select_related('user').order_by('created_at')
+        ))
+        .order_by('-created_at')[:settings.NOTES_MAX_RESULTS]
+    )
     notes_data = []
     
     for note in notes:
@@ -47,18 +100,34 @@ def get_notes(request):
                 'id': note.user.id,
                 'username': note.user.username
             },
-            'is_owner': note.user == request.user,
+            'is_owner': note.user_id == request.user.id,
             'comments': [{
                 'id': comment.id,
                 'content': comment.content,
                 'author': comment.user.username,
                 'created_at': comment.created_at.strftime('%Y-%m-%d %H:%M'),
-                'is_owner': comment.user == request.user
+                'is_owner': comment.user_id == request.user.id
             } for comment in note.comments.all()]
         }
         notes_data.append(note_data)
     
-    return JsonResponse({'notes': notes_data})
+    return JsonResponse({'notes': notes_data, 'clusters': []})
+
+def get_note_clusters(bbox, zoom):
+    """Count notes per grid cell inside bbox, roughly NOTE_CLUSTER_CELL_PX wide on screen"""
+    cell = 360.0 / (256 * 2 ** max(zoom, 0)) * settings.NOTE_CLUSTER_CELL_PX
+    sql = f"""
+        SELECT COUNT(*), ST_X(ST_Centroid(ST_Collect(location))), ST_Y(ST_Centroid(ST_Collect(location)))
+        FROM {LocationNote._meta.db_table}
+        WHERE location && ST_MakeEnvelope(%s, %s, %s, %s, 4326)
+        GROUP BY ST_SnapToGrid(location, %s)
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*bbox, cell])
+        return [
+            {'count': count, 'longitude': lng, 'latitude': lat}
+            for count, lng, lat in cursor.fetchall()
+        ]
 
 def update_location(request):
     if request.method == 'POST':
@@ -68,7 +137,7 @@ def update_location(request):
             accuracy = float(request.POST.get('accuracy', 100))
             
             from .models import set_user_location
-            profile = set_user_location(
+            accepted = set_user_location(
                 request.user.id,
                 latitude,
                 longitude,
@@ -76,7 +145,8 @@ def update_location(request):
             )
             return JsonResponse({
                 'success': True,
-                'message': 'Location updated successfully'
+                'accepted': accepted,
+                'message': 'Location updated successfully' if accepted else 'Location unchanged'
             })
         except (ValueError, TypeError) as e:
             return JsonResponse({
@@ -94,16 +164,63 @@ def update_location(request):
     }, status=405)
 
 class GameListCreate(generics.ListCreateAPIView):
+    """List games for the lobby, or create one.
+
+    GET supports ``?status=WAITING,ACTIVE`` (defaults to every status except
+    FINISHED) and ``?lat=&lng=&within_km=`` to only return games centred
+    near the caller. Results are cursor paginated, newest first.
+    """
     serializer_class = GameSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = GameCursorPagination
+
+    def get_serializer_class(self):
+        if self.request.method == 'GET':
+            return GameListSerializer
+        return GameSerializer
+
+    def list(self, request, *args, **kwargs):
+        if not settings.FAST_SERIALIZERS:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = queryset.prefetch_related(None).values(*fast_serializers.GAME_LIST_FIELDS)
+        page = self.paginate_queryset(rows)
+        return self.get_paginated_response([fast_serializers.game_list_item(row) for row in page])
 
     def get_queryset(self):
-        return Game.objects.all()
+        serializer_class = self.get_serializer_class()
+        queryset = Game.objects.all()
+        if self.request.method != 'GET':
+            return serializer_class.setup_eager_loading(queryset)
+
+        params = self.request.query_params
+        statuses = [s for s in params.get('status', '').upper().split(',') if s]
+        if statuses:
+            queryset = queryset.filter(status__in=statuses)
+        else:
+            queryset = queryset.exclude(status='FINISHED')
+
+        if 'within_km' in params:
+            try:
+                lat = float(params['lat'])
+                lng = float(params['lng'])
+                radius_m = float(params['within_km']) * 1000
+            except (KeyError, TypeError, ValueError):
+                raise ValidationError('lat, lng and within_km must be numbers')
+            origin = Point(lng, lat, srid=4326)
+            # The bounding box test is answered from the GiST index on center,
+            # the exact spherical distance only runs on what survives it
+            queryset = queryset.filter(
+                center__bboverlaps=Polygon.from_bbox(bbox_around(lng, lat, radius_m)),
+                center__distance_lte=(origin, D(m=radius_m))
+            )
+
+        return serializer_class.setup_eager_loading(queryset)
 
     def perform_create(self, serializer):
         try:
             data = self.request.data
-            print("Received data:", data)  # Debug log
+            logger.debug('Creating game from %s', data)
 
             # Extract coordinates
             center_data = data.get('center', {})
@@ -120,7 +237,7 @@ class GameListCreate(generics.ListCreateAPIView):
                 center=Point(coordinates[0], coordinates[1]),  # longitude, latitude
                 radius=data.get('radius', 500),
                 kitty_value_per_player=data.get('kitty_value_per_player', 10),
-                start_area=Point(coordinates[0], coordinates[1]).buffer(data.get('radius', 500) / 111000)
+                start_area=circle_polygon(Point(coordinates[0], coordinates[1]), float(data.get('radius', 500)))
             )
 
             # Add host as first player and calculate initial kitty
@@ -128,7 +245,7 @@ class GameListCreate(generics.ListCreateAPIView):
             return game
 
         except Exception as e:
-            print(f"Error creating game: {str(e)}")  # Debug log
+            logger.warning('Error creating game: %s', e)
             raise ValidationError(str(e))
 
 class GameDetail(generics.RetrieveUpdateAPIView):
@@ -152,17 +269,27 @@ class GameDetail(generics.RetrieveUpdateAPIView):
             center_data = data.get('center', {})
             coordinates = center_data.get('coordinates', [])
             
+            update_fields = []
             if coordinates:
                 game.center = Point(coordinates[0], coordinates[1])
+                update_fields.append('center')
             
             if 'radius' in data:
                 game.radius = data['radius']
+                update_fields.append('radius')
+
+            if update_fields:
+                # Game.save fills in a missing area from the centre and radius
+                update_fields += ['start_area', 'current_area', 'area_set']
             
             if 'kitty_value_per_player' in data:
                 game.kitty_value_per_player = data['kitty_value_per_player']
-                game.calculate_total_kitty()  # Recalculate total kitty
+                update_fields.append('kitty_value_per_player')
             
-            game.save()
+            if update_fields:
+                game.save(update_fields=update_fields)
+            if 'kitty_value_per_player' in data:
+                game.calculate_total_kitty()  # Recalculate from the saved value
             return Response(GameSerializer(game).data)
             
         except Exception as e:
@@ -172,23 +299,32 @@ class GameDetail(generics.RetrieveUpdateAPIView):
             )
 
     def get_queryset(self):
-        print(f"User making request: {self.request.user}")
-        return Game.objects.all()
+        logger.debug('User making request: %s', self.request.user)
+        return GameSerializer.setup_eager_loading(Game.objects.all())
 
     def retrieve(self, request, *args, **kwargs):
+        if settings.FAST_SERIALIZERS:
+            games = fast_serializers.game_details(
+                self.get_queryset().filter(pk=kwargs['pk']), request.query_params.get('area')
+            )
+            if not games:
+                raise Http404
+            logger.debug('Game data being sent: %s', games[0])
+            return Response(games[0])
+
         instance = self.get_object()
         serializer = self.get_serializer(instance)
-        print("Game data being sent:", serializer.data)  # Debug log
+        logger.debug('Game data being sent: %s', serializer.data)
         return Response(serializer.data)
 
 class JoinGame(generics.GenericAPIView):
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
 
     def post(self, request, pk):
         try:
             game = Game.objects.get(pk=pk)
-            print(f"User {request.user.username} attempting to join game {pk}")  # Debug log
+            logger.debug('User %s attempting to join game %s', request.user.pk, pk)
             
             # Check if user is already in the game
             if GamePlayer.objects.filter(game=game, user=request.user).exists():
@@ -203,7 +339,7 @@ class JoinGame(generics.GenericAPIView):
                 user=request.user,
                 team=game.players.count() % 2 + 1  # Teams are 1 or 2
             )
-            print(f"Created player: {player}")  # Debug log
+            logger.debug('Created player: %s', player)
             
             # Get updated game data
             game.refresh_from_db()
@@ -219,7 +355,7 @@ class JoinGame(generics.GenericAPIView):
                 status=status.HTTP_404_NOT_FOUND
             )
         except Exception as e:
-            print(f"Error joining game: {str(e)}")  # Debug log
+            logger.warning('Error joining game: %s', e)
             return Response(
                 {'error': str(e)}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -229,8 +365,16 @@ class UpdateLocation(APIView):
     def post(self, request, pk):
         game = get_object_or_404(Game, pk=pk)
         player = get_object_or_404(GamePlayer, game=game, user=request.user)
-        player.update_location(request.data['latitude'], request.data['longitude'])
-        return Response({'status': 'updated'}, status=status.HTTP_200_OK)
+        try:
+            accepted = player.update_location(
+                request.data['latitude'],
+                request.data['longitude'],
+                request.data.get('accuracy')
+            )
+        except (KeyError, TypeError, ValueError):
+            return Response({'error': 'Invalid coordinates provided'},
+                          status=status.HTTP_400_BAD_REQUEST)
+        return Response({'status': 'updated' if accepted else 'ignored'}, status=status.HTTP_200_OK)
 
 class CreateHint(APIView):
     def post(self, request, pk):
@@ -252,7 +396,7 @@ class SelectPlayer(APIView):
                           status=status.HTTP_403_FORBIDDEN)
         player = get_object_or_404(GamePlayer, id=request.data['player_id'])
         game.selected_player = player.user
-        game.save()
+        game.save(update_fields=['selected_player'])
         return Response({'status': 'selected'}, status=status.HTTP_200_OK)
 
 class StartGame(APIView):
@@ -260,32 +404,35 @@ class StartGame(APIView):
 
     def post(self, request, pk):
         try:
-            game = Game.objects.get(pk=pk)
+            state = get_game_state(pk)
+            if state is None:
+                raise Game.DoesNotExist
             
-            # Add debug logging
-            print(f"Starting game {pk}")
-            print(f"Area set: {game.area_set}")
-            print(f"Player count: {game.players.count()}")
+            logger.debug('Starting game %s (area set: %s, players: %s)',
+                         pk, state['area_set'], len(state['members']))
             
             # Check if user is host
-            if game.host != request.user:
+            if state['host_id'] != request.user.id:
                 return Response({'error': 'Only the host can start the game'}, status=403)
             
             # Check if area has been set
-            if not game.area_set:
+            if not state['area_set']:
                 return Response({'error': 'Game area must be set before starting'}, status=400)
 
             # Check minimum players
-            if game.players.count() < 3:  # Changed back to 3 players minimum
+            if len(state['members']) < 3:  # Changed back to 3 players minimum
                 return Response({'error': 'Need at least 3 players to start'}, status=400)
+
+            game = Game.objects.get(pk=pk)
             
             # Assign teams first, then update status
-            print("Calling assign_teams_and_hunted()")  # Debug print
             game.assign_teams_and_hunted()
             
-            # Update game status
+            # Update game status and lay out the zone for the whole game
             game.status = 'ACTIVE'
-            game.save()
+            game.start_shrink_schedule()
+            game.save(update_fields=['status', 'started_at', 'current_stage', 'shrink_schedule'])
+            send_game_event(game.id, {'type': 'game_started', 'game_status': game.status})
 
             # Return updated game data
             serializer = GameSerializer(game)
@@ -412,7 +559,7 @@ class GameViewSet(viewsets.ModelViewSet):
             )
         
         game.status = 'active'
-        game.save()
+        game.save(update_fields=['status'])
         return Response({'status': 'started'}, status=status.HTTP_200_OK)
 
 class GameHintViewSet(viewsets.ModelViewSet):
@@ -425,10 +572,10 @@ class GameHintViewSet(viewsets.ModelViewSet):
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def login_view(request):
-    print("Login attempt with data:", request.data)  # Debug log
-    
     username = request.data.get('username')
     password = request.data.get('password')
+    # Never log the password or the token
+    logger.debug('Login attempt for %s', username)
     
     if not username or not password:
         return Response({
@@ -436,7 +583,7 @@ def login_view(request):
         }, status=status.HTTP_400_BAD_REQUEST)
     
     user = authenticate(username=username, password=password)
-    print("Authenticated user:", user)  # Debug log
+    logger.debug('Authenticated user: %s', user)
     
     if not user:
         return Response({
@@ -445,7 +592,6 @@ def login_view(request):
     
     # Get or create token
     token, _ = Token.objects.get_or_create(user=user)
-    print("Generated token:", token.key)  # Debug log
     
     return Response({
         'token': token.key,
@@ -477,9 +623,8 @@ def logout_view(request):
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def register_view(request):
-    print("Registration attempt with data:", request.data)  # Debug log
-    
     username = request.data.get('username')
+    logger.debug('Registration attempt for %s', username)
     password = request.data.get('password')
     
     if not username or not password:
@@ -495,7 +640,7 @@ def register_view(request):
     try:
         user = User.objects.create_user(username=username, password=password)
         token, _ = Token.objects.get_or_create(user=user)
-        print(f"Created user {username} with token {token.key}")  # Debug log
+        logger.debug('Created user %s', username)
         
         return Response({
             'token': token.key,
@@ -505,16 +650,14 @@ def register_view(request):
             }
         })
     except Exception as e:
-        print(f"Registration error: {str(e)}")  # Debug log
+        logger.warning('Registration error: %s', e)
         return Response({
             'error': 'Registration failed'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['GET'])
 def current_user(request):
-    print("Current user session:", request.session.session_key)
-    print("Current user auth:", request.user.is_authenticated)
-    print("Current user:", request.user)
+    logger.debug('Current user: %s', request.user)
     
     if request.user.is_authenticated:
         return Response({
@@ -527,22 +670,24 @@ def current_user(request):
 @permission_classes([IsAuthenticated])
 def join_game(request, game_id):
     try:
-        game = Game.objects.get(id=game_id)
-        if game.status != 'WAITING':
+        state = get_game_state(game_id)
+        if state is None:
+            raise Game.DoesNotExist
+        if state['status'] != 'WAITING':
             return Response({'error': 'Game has already started'}, status=400)
+
+        game = Game.objects.get(id=game_id)
         
         # Check if player is already in the game
-        if not GamePlayer.objects.filter(game=game, user=request.user).exists():
+        if request.user.id not in state['members']:
             # Add player and recalculate kitty
             game.add_player(request.user)
             
-            # Force refresh from database and recalculate
+            # Pick up the kitty and player count recalculated on commit
             game.refresh_from_db()
-            game.calculate_total_kitty()  # Force recalculation
             
-            print(f"Game {game.id} now has {game.players.count()} players")  # Debug log
-            print(f"Kitty per player: €{game.kitty_value_per_player}")  # Debug log
-            print(f"Total kitty: €{game.total_kitty}")  # Debug log
+            logger.debug('Game %s now has %s players, kitty %s per player, %s total',
+                         game.id, game.player_count, game.kitty_value_per_player, game.total_kitty)
         
         return Response(GameSerializer(game).data)
     except Game.DoesNotExist:
@@ -563,7 +708,12 @@ def end_game(request, game_id):
         
         # End the game
         game.status = 'FINISHED'
-        game.save()
+        game.save(update_fields=['status'])
+
+        send_game_event(game.id, {
+            'type': 'game_finished',
+            'game_status': game.status
+        })
         
         return Response({
             "message": "Game ended successfully",
@@ -603,18 +753,19 @@ def update_game_area(request, game_id):
         # Create center point (longitude, latitude order for PostGIS)
         center_point = Point(lng, lat, srid=4326)
         
-        # Debug logging
-        print(f"Creating game area with center: lat={lat}, lng={lng}")
-        print(f"Radius: {radius} meters")
+        logger.debug('Creating game area at lat=%s lng=%s, radius %s m', lat, lng, radius)
         
-        # Convert radius from meters to degrees
-        degree_radius = radius / 111000
-        
-        # Create the circular buffer
-        game.start_area = center_point.buffer(degree_radius)
+        # Create the circular area
+        game.center = center_point
+        game.start_area = circle_polygon(center_point, radius)
         game.current_area = game.start_area
         game.area_set = True
-        game.save()
+        game.save(update_fields=['center', 'radius', 'start_area', 'current_area', 'area_set'])
+
+        send_game_event(game.id, {
+            'type': 'area_update',
+            'area': area_representation(game)
+        })
         
         # Return the center point and radius in the response
         return Response({
@@ -636,18 +787,23 @@ def set_game_area(request, game_id):
         radius = request.data.get('radius')
         
         # Create a circular polygon from center and radius
-        point = Point(center['coordinates'])
-        circle = point.buffer(radius / 111000)  # Convert meters to degrees (approximately)
+        point = Point(center['coordinates'], srid=4326)
+        circle = circle_polygon(point, float(radius))
         
         # Update both current_area and start_area
         game.current_area = circle
         game.start_area = circle  # Add this line
         game.area_set = True
         game.radius = radius  # Store the radius
-        game.save()
+        game.center = point
+        game.save(update_fields=['center', 'radius', 'start_area', 'current_area', 'area_set'])
+
+        send_game_event(game.id, {
+            'type': 'area_update',
+            'area': area_representation(game)
+        })
         
-        print(f"Set game area - Center: {center['coordinates']}, Radius: {radius}")
-        print(f"Resulting area: {game.current_area}")
+        logger.debug('Set game %s area, center %s radius %s', game.id, center['coordinates'], radius)
         
         return Response({
             'status': 'success',
@@ -659,81 +815,106 @@ def set_game_area(request, game_id):
     except Game.DoesNotExist:
         return Response({'error': 'Game not found'}, status=404)
     except Exception as e:
-        print(f"Error setting game area: {str(e)}")
+        logger.warning('Error setting game area: %s', e)
         return Response({'error': str(e)}, status=400)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def start_game(request, game_id):
     try:
-        game = Game.objects.get(id=game_id)
+        state = get_game_state(game_id)
+        if state is None:
+            raise Game.DoesNotExist
         
         # Check if user is host
-        if game.host != request.user:
+        if state['host_id'] != request.user.id:
             return Response({'error': 'Only the host can start the game'}, status=403)
         
         # Check if game can be started
-        if game.status != 'WAITING':
+        if state['status'] != 'WAITING':
             return Response({'error': 'Game cannot be started'}, status=400)
             
-        if not game.area_set:
+        if not state['area_set']:
             return Response({'error': 'Game area must be set before starting'}, status=400)
             
-        if game.players.count() < 3:
+        if len(state['members']) < 3:
             return Response({'error': 'Need at least 3 players to start'}, status=400)
 
+        game = Game.objects.get(id=game_id)
+
         # Assign teams and start game
-        print("Assigning teams for game", game_id)  # Debug print
         game.assign_teams_and_hunted()
         game.status = 'ACTIVE'
-        game.save()
+        game.start_shrink_schedule()
+        game.save(update_fields=['status', 'started_at', 'current_stage', 'shrink_schedule'])
+        send_game_event(game.id, {'type': 'game_started', 'game_status': game.status})
         
         return Response(GameSerializer(game).data)
         
     except Game.DoesNotExist:
         return Response({'error': 'Game not found'}, status=404)
     except Exception as e:
-        print(f"Error starting game: {str(e)}")  # Debug print
+        logger.warning('Error starting game: %s', e)
         return Response({'error': str(e)}, status=400)
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def chat_history(request, game_id):
+def _int_param(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
     try:
-        game = Game.objects.get(id=game_id)
-        messages = ChatMessage.objects.filter(game=game)
-        serializer = ChatMessageSerializer(messages, many=True)
-        return Response(serializer.data)
-    except Game.DoesNotExist:
-        return Response({'error': 'Game not found'}, status=404)
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValidationError(f'{name} must be an integer')
 
-@api_view(['POST', 'GET'])
+def parse_message_page(params):
+    """(after_id, before_id, limit, wait) from the chat paging query parameters"""
+    after_id = _int_param(params, 'after_id')
+    before_id = _int_param(params, 'before_id')
+    limit = _int_param(params, 'limit') or settings.CHAT_PAGE_SIZE
+    limit = max(1, min(limit, settings.CHAT_MAX_PAGE_SIZE))
+    try:
+        wait = float(params.get('wait') or 0)
+    except (TypeError, ValueError):
+        raise ValidationError('wait must be a number of seconds')
+    wait = max(0, min(wait, settings.CHAT_LONG_POLL_TIMEOUT))
+    return after_id, before_id, limit, wait
+
+def message_page_query(game_id, after_id, before_id, limit, fields=None):
+    """Queryset of one chat page; pages without after_id come newest first.
+
+    With fields the page is of ``.values(*fields)`` rows.
+    """
+    messages = ChatMessage.objects.filter(game_id=game_id).select_related('user')
+    if fields:
+        messages = messages.values(*fields)
+    if after_id is not None:
+        return messages.filter(id__gt=after_id).order_by('id')[:limit]
+    if before_id is not None:
+        messages = messages.filter(id__lt=before_id)
+    return messages.order_by('-id')[:limit]
+
+@api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def game_messages(request, game_id):
     try:
-        game = Game.objects.get(id=game_id)
+        state = get_game_state(game_id)
+        if state is None:
+            raise Game.DoesNotExist
         
-        if not game.players.filter(user=request.user).exists():
+        if request.user.id not in state['members']:
             return Response(
                 {"error": "Not authorized to access this game"}, 
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        if request.method == 'GET':
-            # Get messages in chronological order (oldest first)
-            messages = ChatMessage.objects.filter(game=game).order_by('created_at')
-            serializer = ChatMessageSerializer(messages, many=True)
-            return Response(serializer.data)
-
-        elif request.method == 'POST':
-            # Create new message
-            message = ChatMessage.objects.create(
-                game=game,
-                user=request.user,
-                content=request.data.get('message', '')
-            )
-            serializer = ChatMessageSerializer(message)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        # Reads are served by async_views.game_messages
+        message = ChatMessage.objects.create(
+            game_id=game_id,
+            user=request.user,
+            content=request.data.get('message', '')
+        )
+        serializer = ChatMessageSerializer(message)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     except Game.DoesNotExist:
         return Response(
@@ -741,14 +922,54 @@ def game_messages(request, game_id):
             status=status.HTTP_404_NOT_FOUND
         )
 
+def _datetime_param(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError(f'{name} must be an ISO 8601 datetime')
+    return parsed
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def game_replay(request, game_id):
+    """Stream a game's location history as NDJSON, oldest fix first.
+
+    ``since`` and ``until`` limit the replay to a time window. Rows are read in
+    chunks while the response is sent, so long games aren't loaded in memory.
+    """
+    state = get_game_state(game_id)
+    if state is None:
+        return Response({'error': 'Game not found'}, status=status.HTTP_404_NOT_FOUND)
+    if request.user.id not in state['members'] and request.user.id != state['host_id']:
+        return Response(
+            {"error": "Not authorized to access this game"},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+    since = _datetime_param(request.query_params, 'since')
+    until = _datetime_param(request.query_params, 'until')
+    return StreamingHttpResponse(
+        areplay_lines(game_id, since, until),
+        content_type='application/x-ndjson'
+    )
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def subtract_from_kitty(request, game_id):
     try:
-        game = Game.objects.get(id=game_id)
-        player = game.players.get(user=request.user)
+        state = get_game_state(game_id)
+        if state is None:
+            raise Game.DoesNotExist
+        team = state['members'].get(request.user.id)
+        if team is None:
+            raise GamePlayer.DoesNotExist
         
-        if player.team != 0:
+        if team != 0:
             return Response(
                 {"error": "Only hunted players can subtract from kitty"}, 
                 status=status.HTTP_403_FORBIDDEN
@@ -768,7 +989,8 @@ def subtract_from_kitty(request, game_id):
                 status=status.HTTP_400_BAD_REQUEST
             )
             
-        current_total = game.total_kitty or game.kitty_value_per_player * game.players.count()
+        game = Game.objects.get(id=game_id)
+        current_total = game.total_kitty or game.kitty_value_per_player * len(state['members'])
             
         if amount > current_total:
             return Response(
@@ -777,7 +999,19 @@ def subtract_from_kitty(request, game_id):
             )
             
         # Use the new method to subtract and check if game ended
-        game_ended = game.subtract_from_kitty(amount)
+        game_ended = game.subtract_from_kitty(amount, user=request.user)
+
+        send_game_event(game.id, {
+            'type': 'kitty_update',
+            'total_kitty': str(game.total_kitty),
+            'game_status': game.status
+        })
+        if game_ended:
+            send_game_event(game.id, {
+                'type': 'game_finished',
+                'game_status': game.status,
+                'winning_team': 'Hunted'
+            })
         
         response_data = {
             "message": f"Successfully subtracted €{amount} from kitty",
@@ -811,7 +1045,7 @@ def subtract_from_kitty(request, game_id):
             status=status.HTTP_404_NOT_FOUND
         )
     except Exception as e:
-        print(f"Error in subtract_from_kitty: {str(e)}")
+        logger.exception('Error in subtract_from_kitty')
         return Response(
             {"error": str(e)}, 
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
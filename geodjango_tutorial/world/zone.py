@@ -0,0 +1,120 @@
+"""
+Zone enforcement.
+
+Finds every located player standing outside their game's current zone across
+all active games in one set-based PostGIS query, and turns changes in that set
+into zone events for the affected games. Games with a shrink schedule are
+checked against the zone clients draw, interpolated with ``shrink.zone_at``
+while it moves from one stage to the next.
+"""
+
+from collections import defaultdict, namedtuple
+
+from django.db import connection
+from django.utils import timezone
+
+from .events import send_game_event
+from .models import Game, GamePlayer
+from .shrink import zone_at
+
+ZoneViolation = namedtuple('ZoneViolation', ['game_id', 'user_id', 'team', 'distance'])
+
+
+def current_zones(game_ids=None):
+    """{game_id: (lng, lat, radius)} for active games with a shrink schedule"""
+    games = (
+        Game.objects
+        .filter(status='ACTIVE', started_at__isnull=False)
+        .exclude(shrink_schedule=[])
+        .values_list('id', 'started_at', 'shrink_schedule')
+    )
+    if game_ids is not None:
+        games = games.filter(id__in=game_ids)
+
+    now = timezone.now()
+    return {
+        game_id: zone_at(schedule, (now - started_at).total_seconds())
+        for game_id, started_at, schedule in games
+    }
+
+
+def find_out_of_zone(game_ids=None):
+    """ZoneViolations for players outside the zone of an active game.
+
+    ``distance`` is how far outside the zone the player is, in metres. Circular
+    zones are tested by geodesic distance to the centre, which ST_DWithin can
+    answer without building the polygon; games without a centre fall back to
+    the area polygon. Zones from ``current_zones`` take the place of the
+    stored centre and radius, which only change when a stage is reached.
+    """
+    zones = current_zones(game_ids)
+    sql = f"""
+        WITH zone(game_id, lng, lat, radius) AS (
+            SELECT * FROM unnest(%s::bigint[], %s::float8[], %s::float8[], %s::float8[])
+        )
+        SELECT p.game_id, p.user_id, p.team,
+               CASE WHEN c.center IS NOT NULL
+                    THEN ST_Distance(p.location::geography, c.center::geography) - c.radius
+                    ELSE ST_Distance(p.location::geography, g.current_area::geography)
+               END
+        FROM {GamePlayer._meta.db_table} p
+        JOIN {Game._meta.db_table} g ON g.id = p.game_id
+        LEFT JOIN zone z ON z.game_id = g.id
+        CROSS JOIN LATERAL (
+            SELECT COALESCE(ST_SetSRID(ST_MakePoint(z.lng, z.lat), 4326), g.center) AS center,
+                   COALESCE(z.radius, g.radius) AS radius
+        ) c
+        WHERE g.status = 'ACTIVE'
+          AND p.location IS NOT NULL
+          AND (
+              (c.center IS NOT NULL
+               AND NOT ST_DWithin(p.location::geography, c.center::geography, c.radius))
+              OR (c.center IS NULL AND g.current_area IS NOT NULL
+                  AND NOT ST_Covers(g.current_area, p.location))
+          )
+    """
+    params = [
+        list(zones),
+        [lng for lng, _, _ in zones.values()],
+        [lat for _, lat, _ in zones.values()],
+        [radius for _, _, radius in zones.values()],
+    ]
+    if game_ids is not None:
+        sql += " AND g.id = ANY(%s)"
+        params.append(list(game_ids))
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [ZoneViolation(*row) for row in cursor.fetchall()]
+
+
+class ZoneMonitor:
+    """Remembers who is outside the zone and reports only the changes"""
+
+    def __init__(self):
+        self.outside = {}
+
+    def check(self, game_ids=None):
+        violations = find_out_of_zone(game_ids)
+        outside = {(v.game_id, v.user_id): v for v in violations}
+
+        left = defaultdict(list)
+        returned = defaultdict(list)
+        for key, violation in outside.items():
+            if key not in self.outside:
+                left[violation.game_id].append({
+                    'user_id': violation.user_id,
+                    'team': violation.team,
+                    'distance': round(violation.distance, 1),
+                })
+        for game_id, user_id in self.outside.keys() - outside.keys():
+            returned[game_id].append(user_id)
+        self.outside = outside
+
+        for game_id in left.keys() | returned.keys():
+            send_game_event(game_id, {
+                'type': 'zone_violation',
+                'outside': left.get(game_id, []),
+                'returned': returned.get(game_id, []),
+            })
+        return violations